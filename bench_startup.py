@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+""" Import time of `video` and latency of a metadata-only task: process per task vs preloaded worker pool.
+
+    python bench_startup.py [--tasks 200] [--workers 4] [--repeats 5]
+
+"eager" rows import what `video` used to import at module level (cv2, pydub, numpy, yaml) before it is imported,
+i.e. the cost every worker paid before imports became lazy. Modules that are not installed are skipped.
+"""
+import argparse
+import importlib.util
+import os
+import pickle
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EAGER_MODULES = [m for m in ('cv2', 'pydub.utils', 'numpy', 'yaml') if importlib.util.find_spec(m.split('.')[0])]
+
+
+def load_meta_task(path, cache_dir, root_dir):
+    from video import Video
+
+    return Video(path, cached=True, cache_dir=cache_dir, root_dir=root_dir).fps
+
+
+def _task_code(path, cache_dir, root_dir, eager):
+    imports = ''.join(f'import {m}; ' for m in EAGER_MODULES) if eager else ''
+    return (f'import sys; sys.path.insert(0, {HERE!r}); {imports}from bench_startup import load_meta_task; '
+            f'load_meta_task({path!r}, {cache_dir!r}, {root_dir!r})')
+
+
+def run_python(code):
+    start = perf_counter()
+    subprocess.run([sys.executable, '-c', code], check=True)
+    return perf_counter() - start
+
+
+def make_library(root_dir, n):
+    cache_dir = os.path.join(root_dir, '.cache')
+    os.makedirs(cache_dir)
+    paths = []
+    for i in range(n):
+        path = os.path.join(root_dir, f'video_{i}.mp4')
+        meta = {'fps': 25., 'frame_num': 250, 'duration': 10., 'width': 1920., 'height': 1080., 'rotation': 0}
+        with open(os.path.join(cache_dir, f'video_{i}.mp4.meta'), 'wb') as file:
+            pickle.dump([meta, 1], file)
+        paths.append(path)
+    return paths, cache_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = statistics.median(run_python('pass') for _ in range(args.repeats))
+    print(f'eagerly imported modules available here: {EAGER_MODULES or "none"}')
+    print(f'{"import":<40}{"median, ms":>12}')
+    print(f'{"python -c pass":<40}{baseline * 1e3:>12.1f}')
+    for title, eager in (('import video (eager, before)', True), ('import video (lazy, after)', False)):
+        imports = ''.join(f'import {m}; ' for m in EAGER_MODULES) if eager else ''
+        code = f'import sys; sys.path.insert(0, {HERE!r}); {imports}import video'
+        elapsed = statistics.median(run_python(code) for _ in range(args.repeats))
+        print(f'{title:<40}{(elapsed - baseline) * 1e3:>12.1f}')
+
+    with tempfile.TemporaryDirectory() as root_dir:
+        paths, cache_dir = make_library(root_dir, args.tasks)
+        n_subprocess = min(args.tasks, 20)
+        print(f'\n{"metadata task":<40}{"ms / task":>12}')
+        for title, eager in (('process per task (eager, before)', True), ('process per task (lazy)', False)):
+            elapsed = sum(run_python(_task_code(p, cache_dir, root_dir, eager)) for p in paths[:n_subprocess])
+            print(f'{title:<40}{elapsed / n_subprocess * 1e3:>12.2f}')
+
+        sys.path.insert(0, HERE)
+        from worker_pool import get_pool
+
+        pool = get_pool(args.workers)
+        start = perf_counter()
+        list(pool.map(load_meta_task, paths[:args.workers], [cache_dir] * args.workers, [root_dir] * args.workers))
+        print(f'{"preloaded pool: startup":<40}{(perf_counter() - start) * 1e3:>12.2f}')
+        start = perf_counter()
+        list(pool.map(load_meta_task, paths, [cache_dir] * len(paths), [root_dir] * len(paths), chunksize=8))
+        print(f'{"preloaded pool: warm (after)":<40}{(perf_counter() - start) / len(paths) * 1e3:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+import os
+import pickle
+from collections import namedtuple
+
+from utils import WINDOWS, correct_path, make_folder, _normalize_extensions, _match_extension
+
+IndexChanges = namedtuple('IndexChanges', ['added', 'modified', 'deleted'])
+
+
+class DirectoryIndex:
+    """ Persistent (path -> size, mtime, inode) index of a video library.
+
+    `scan()` returns only added, modified and deleted files since the previous scan. Every directory is still
+    stat'ed (a directory mtime changes only when its own entries are added, removed or renamed), but directories
+    with unchanged mtime are not listed again. With stat_files=False files of such directories aren't stat'ed
+    either, so in-place rewrites of existing files are not detected - fine for append-only archives.
+    """
+    VERSION = 2
+
+    def __init__(self, paths: [list, str, tuple], extensions: tuple, cache_dir, exclude_path=None, index_path=None,
+                 stat_files=True):
+        self.paths = [correct_path(p) for p in ([paths] if isinstance(paths, str) else paths)]
+        self.extensions = _normalize_extensions(extensions)
+        self.cache_dir = cache_dir
+        self.exclude_path = correct_path(exclude_path) if exclude_path is not None else None
+        self.index_path = index_path or os.path.join(cache_dir, 'directory.index')
+        self.stat_files = stat_files
+        self.sep = '/' if WINDOWS else os.sep
+
+        self.dirs = {}  # dir path -> (mtime_ns, subdirs, names of matched files)
+        self.files = {}  # file path -> (size, mtime_ns, inode)
+        self.load()
+
+    def __len__(self):
+        return len(self.files)
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __contains__(self, path):
+        return path in self.files
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, 'rb') as file:
+                version, settings, dirs, files = pickle.load(file)
+        except Exception:
+            version, settings = None, None
+        if version != self.VERSION:
+            print(f'Index `{self.index_path}` is broken or outdated. Library will be rescanned from scratch')
+            return False
+        if settings != self._settings():
+            # cached listings of directories were filtered with other extensions / exclude_path: every directory
+            # is listed again, known files that still match are kept so that they aren't reported as added
+            print(f'Index `{self.index_path}` was built with other settings {settings}. '
+                  f'All directories will be listed again')
+            self.files = {p: record for p, record in files.items()
+                          if _match_extension(p, self.extensions) and not self._is_excluded(p)}
+            return False
+        self.dirs, self.files = dirs, files
+        return True
+
+    def _settings(self):
+        return {'extensions': sorted(self.extensions), 'exclude_path': self.exclude_path}
+
+    def save(self):
+        make_folder(os.path.dirname(self.index_path) or '.')
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump([self.VERSION, self._settings(), self.dirs, self.files], file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+
+    def _is_excluded(self, path):
+        return self.exclude_path is not None and path.startswith(self.exclude_path)
+
+    def _list_dir(self, dirpath):
+        subdirs, names, stats = [], [], {}
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    name = entry.name
+                    if name.startswith('.'):
+                        continue
+                    path = f'{dirpath}{self.sep}{name}'
+                    if self._is_excluded(path):
+                        continue
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(path)
+                        elif _match_extension(name, self.extensions):
+                            names.append(name)
+                            stats[name] = entry.stat()
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return subdirs, names, stats
+
+    @staticmethod
+    def _file_record(st):
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def scan(self, save=True) -> IndexChanges:
+        old_files = self.files
+        new_dirs, new_files = {}, {}
+
+        stack = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                path = path.rstrip('/' + os.sep) or path
+                if not self._is_excluded(path):
+                    stack.append(path)
+            elif _match_extension(path, self.extensions) and not self._is_excluded(path):
+                try:
+                    new_files[path] = self._file_record(os.stat(path))
+                except OSError:
+                    pass
+
+        while stack:
+            dirpath = stack.pop()
+            try:
+                mtime = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue
+
+            cached = self.dirs.get(dirpath)
+            if cached is not None and cached[0] == mtime:
+                _, subdirs, names = cached
+                for name in names:
+                    path = f'{dirpath}{self.sep}{name}'
+                    if not self.stat_files and path in old_files:
+                        new_files[path] = old_files[path]
+                        continue
+                    try:
+                        new_files[path] = self._file_record(os.stat(path))
+                    except OSError:
+                        pass
+            else:
+                subdirs, names, stats = self._list_dir(dirpath)
+                for name in names:
+                    new_files[f'{dirpath}{self.sep}{name}'] = self._file_record(stats[name])
+
+            new_dirs[dirpath] = (mtime, subdirs, names)
+            stack.extend(subdirs)
+
+        added = [p for p in new_files if p not in old_files]
+        modified = [p for p, record in new_files.items() if p in old_files and old_files[p] != record]
+        deleted = [p for p in old_files if p not in new_files]
+
+        self.dirs, self.files = new_dirs, new_files
+        if save:
+            self.save()
+        return IndexChanges(sorted(added), sorted(modified), sorted(deleted))
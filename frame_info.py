@@ -1,15 +1,22 @@
+from collections import OrderedDict
+
 import numpy as np
 import cv2
 
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_COLOR = (255, 153, 255)
+
+
+def text_layout(h: int, w: int) -> tuple:
+    """ (x, y, y_pad, font_scale, thickness) of the first text line for frame of size h x w """
+    return int(w * 0.01), int(h * 0.5), int(h * 0.05), h / 1080, int(h // 1000 + 1)
+
 
 def add_text_to_frame(frame: [np.ndarray], text: [list, str]) -> np.ndarray:
     h, w, _ = frame.shape
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    x, y = int(w * 0.01), int(h * 0.5)
-    y_pad = int(h * 0.05)
-    font_scale = h / 1080
-    font_color = (255, 153, 255)
-    line_type = int(h // 1000 + 1)
+    font = FONT
+    x, y, y_pad, font_scale, line_type = text_layout(h, w)
+    font_color = FONT_COLOR
 
     def put_text(i, t_):
         cv2.putText(frame, t_, (x, y + y_pad * i), font, font_scale, font_color, line_type)
@@ -21,3 +28,106 @@ def add_text_to_frame(frame: [np.ndarray], text: [list, str]) -> np.ndarray:
     for t in text:
         line = put_text(line, t)
     return frame
+
+
+class TextOverlay:
+    """ Cached version of add_text_to_frame for frames (H, W, 3) and batches (N, H, W, 3).
+
+    Every text line is rasterized once into a mask keyed by (text, scale, color, frame size) and then copied into
+    frames with NumPy; masks are evicted in LRU order. Output is pixel-identical to add_text_to_frame.
+    A line may be a tuple (static, dynamic): static part is cached, only dynamic part (e.g. frame counter) is drawn
+    with cv2.putText for every frame. For a batch dynamic part may be a sequence with one string per frame.
+    """
+
+    def __init__(self, font_color=FONT_COLOR, maxsize=256):
+        self.font_color = tuple(font_color)
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.cache)
+
+    def clear(self):
+        self.cache.clear()
+
+    def get_sprite(self, text, font_scale, thickness, frame_size):
+        """ Return (mask, dy, dx, advance): bool mask of text pixels, its offset from the text origin and the width
+        of the text """
+        key = (text, font_scale, self.font_color, thickness, frame_size)
+        sprite = self.cache.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        (tw, th), baseline = cv2.getTextSize(text, FONT, font_scale, thickness)
+        # getTextSize is only a rough bbox: glyphs like `{ | } [ ]` reach above th, so the canvas is generous
+        # and the sprite is cropped to the pixels actually drawn
+        margin = th + thickness + 1
+        canvas = np.zeros((th + baseline + 2 * margin, tw + 2 * margin), dtype=np.uint8)
+        cv2.putText(canvas, text, (margin, margin + th), FONT, font_scale, 255, thickness)
+        # getTextSize adds thickness to the width of a line: take width of `text` without it
+        advance = cv2.getTextSize(text + 'x', FONT, font_scale, thickness)[0][0] - \
+            cv2.getTextSize('x', FONT, font_scale, thickness)[0][0]
+        ys, xs = np.nonzero(canvas)
+        if len(ys) == 0:
+            sprite = (np.zeros((0, 0), dtype=bool), 0, 0, advance)
+        else:
+            y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+            sprite = (canvas[y0:y1, x0:x1] > 0, int(y0) - margin - th, int(x0) - margin, advance)
+
+        self.cache[key] = sprite
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return sprite
+
+    def _blend(self, frames, mask, x, y):
+        h, w = frames.shape[-3:-1]
+        y0, x0 = max(y, 0), max(x, 0)
+        y1, x1 = min(y + mask.shape[0], h), min(x + mask.shape[1], w)
+        if y0 >= y1 or x0 >= x1:
+            return
+        mask = mask[y0 - y:y1 - y, x0 - x:x1 - x]
+        roi = frames[..., y0:y1, x0:x1, :]
+        np.copyto(roi, np.asarray(self.font_color, dtype=frames.dtype), where=mask[..., None])
+
+    def _draw_dynamic(self, frame, static, dynamic, x, y, advance, font_scale, thickness):
+        # glyph positions are accumulated with subpixel precision inside putText, so `dynamic` can't just be drawn
+        # from x + advance: the whole line is drawn into a strip that covers only the dynamic part. Pixels of the
+        # static part that get into the strip are the same as in its sprite
+        h, w = frame.shape[:2]
+        (tw, th), baseline = cv2.getTextSize(static + dynamic, FONT, font_scale, thickness)
+        margin = th + thickness + 1
+        x0, y0 = max(x + advance - margin, 0), max(y - th - margin, 0)
+        x1, y1 = min(x + tw + margin, w), min(y + baseline + margin, h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        strip = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.putText(strip, static + dynamic, (x - x0, y - y0), FONT, font_scale, 255, thickness)
+        np.copyto(frame[y0:y1, x0:x1], np.asarray(self.font_color, dtype=frame.dtype), where=(strip > 0)[..., None])
+
+    def __call__(self, frames: np.ndarray, text: [list, str, tuple]) -> np.ndarray:
+        """ Draw text on frame or batch of frames in place """
+        h, w = frames.shape[-3:-1]
+        x, y, y_pad, font_scale, thickness = text_layout(h, w)
+        batch = frames[None] if frames.ndim == 3 else frames
+
+        if isinstance(text, (str, tuple)):
+            text = [text]
+        for i, line in enumerate(text):
+            static, dynamic = line if isinstance(line, tuple) else (line, None)
+            org_y = y + y_pad * i
+            mask, dy, dx, advance = self.get_sprite(static, font_scale, thickness, (h, w))
+            if mask.size:
+                self._blend(batch, mask, x + dx, org_y + dy)
+            if dynamic is None:
+                continue
+            dynamic = [dynamic] * len(batch) if isinstance(dynamic, str) else dynamic
+            assert len(dynamic) == len(batch), \
+                f'Got {len(dynamic)} dynamic texts for batch of {len(batch)} frames in TextOverlay'
+            for frame, t in zip(batch, dynamic):
+                self._draw_dynamic(frame, static, t, x, org_y, advance, font_scale, thickness)
+        return frames
@@ -0,0 +1,196 @@
+import os
+import threading
+import traceback
+from queue import Queue, Empty, Full
+
+from time import time
+import tracing
+
+
+class Stage:
+    def __init__(self, name, func, workers=1, queue_size=None):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue_size = queue_size or 2 * workers
+
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(name="{self.name}", workers={self.workers})'
+
+
+class Pipeline:
+    """ Runs items through stages connected by bounded queues, every stage in its own pool of threads.
+
+    An item moves to the next stage as soon as the previous one finishes it. At most `max_in_flight` items are
+    between entering the first stage and being consumed from the pipeline output, so e.g. the number of downloaded
+    but not yet analysed files stays bounded. Items that fail in a stage are dropped and kept in `self.errors`.
+    Results are yielded in completion order.
+    """
+    _STOP = object()
+
+    def __init__(self, stages, max_in_flight=None, verbose=True):
+        self.stages = stages
+        self.max_in_flight = max_in_flight or sum(stage.queue_size + stage.workers for stage in stages)
+        self.verbose = verbose
+        self.errors = []
+        self.start_time = None
+        self.end_time = None
+
+    def _put(self, queue, item):
+        while not self.cancelled.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _feed(self, items):
+        try:
+            for item in items:
+                while not self.in_flight.acquire(timeout=0.1):
+                    if self.cancelled.is_set():
+                        return
+                if not self._put(self.queues[0], item):
+                    return
+        except Exception as ex:
+            self.errors.append(('input', None, ex))
+        finally:
+            for _ in range(self.stages[0].workers):
+                self._put(self.queues[0], self._STOP)
+
+    def _work(self, i):
+        stage = self.stages[i]
+        queue_in, queue_out = self.queues[i], self.queues[i + 1]
+        while not self.cancelled.is_set():
+            try:
+                item = queue_in.get(timeout=0.1)
+            except Empty:
+                continue
+            if item is self._STOP:
+                break
+
+            start_time = time()
+            try:
+                with tracing.span(f'pipeline.{stage.name}'):
+                    result = stage.func(item)
+            except Exception as ex:
+                with stage.lock:
+                    stage.errors += 1
+                    stage.busy_time += time() - start_time
+                self.errors.append((stage.name, item, ex))
+                if self.verbose:
+                    print(f'ERROR in Pipeline stage `{stage.name}` for `{item}`: {traceback.format_exc()}')
+                self.in_flight.release()
+                continue
+            with stage.lock:
+                stage.processed += 1
+                stage.busy_time += time() - start_time
+            if not self._put(queue_out, result):
+                return
+
+        with self.stopped_lock:
+            self.stopped_workers[i] += 1
+            last = self.stopped_workers[i] == stage.workers
+        if last:
+            next_workers = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            for _ in range(next_workers):
+                self._put(queue_out, self._STOP)
+
+    def __call__(self, items):
+        self.cancelled = threading.Event()
+        self.in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self.queues = [Queue(maxsize=stage.queue_size) for stage in self.stages] + [Queue()]
+        self.stopped_lock = threading.Lock()
+        self.stopped_workers = [0] * len(self.stages)
+        self.start_time, self.end_time = time(), None
+
+        # feeder is not joined: it may be blocked inside the items iterator itself
+        threading.Thread(target=self._feed, args=(items,), daemon=True).start()
+        threads = []
+        for i, stage in enumerate(self.stages):
+            threads += [threading.Thread(target=self._work, args=(i,), daemon=True) for _ in range(stage.workers)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                result = self.queues[-1].get()
+                if result is self._STOP:
+                    break
+                self.in_flight.release()
+                yield result
+        finally:
+            self.cancelled.set()
+            for thread in threads:
+                thread.join()
+            self.end_time = time()
+
+    def run(self, items):
+        return list(self(items))
+
+    @property
+    def stats(self):
+        if self.start_time is None:
+            return {}
+        elapsed = (self.end_time or time()) - self.start_time
+        return {stage.name: {
+            'processed': stage.processed,
+            'errors': stage.errors,
+            'busy_time': stage.busy_time,
+            'throughput': stage.processed / elapsed if elapsed > 0 else 0,
+            'utilization': stage.busy_time / (elapsed * stage.workers) if elapsed > 0 else 0,
+        } for stage in self.stages}
+
+
+def analyse_scenes(video):
+    from scenes import SceneDetector
+
+    if video.status == video.DEFECTIVE:
+        return video
+    detector = SceneDetector(video.path)
+    detector.process()
+    video.update_data('scenes', {'fade_list': detector.fade_list, 'flash_list': detector.flash_list,
+                                 'postprocessed': detector.postprocessed}, add_type='full')
+    video.set_status(max(video.PROCESSED, video.status))
+    return video
+
+
+def download_pipeline(directory, cache_dir, analyse=analyse_scenes, download_workers=4, meta_workers=2,
+                      analysis_workers=1, max_in_flight=8, keep_files=True, **downloader_kwargs):
+    """ Streaming download -> Video meta probe (save_meta) -> analysis pipeline; calling it with items yields
+    Video instances as they are done.
+
+    Items are passed to PlaylistDownloader (YouTube urls by default). At most `max_in_flight` files are
+    downloaded but not yet analysed; with keep_files=False analysed files are removed to keep disk usage bounded.
+    """
+    from video import Video
+    from youtube_downloader import PlaylistDownloader, Progress
+
+    os.makedirs(directory, exist_ok=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    downloader = PlaylistDownloader(directory, **downloader_kwargs)
+    downloader.progress = Progress(stream=None)
+
+    def collect_meta(path):
+        video = Video(path, cached=False, cache_dir=cache_dir)
+        video.save_meta()
+        return video
+
+    def analyse_and_cleanup(video):
+        try:
+            return analyse(video)
+        finally:
+            if not keep_files and os.path.exists(video.path):
+                os.remove(video.path)
+
+    return Pipeline([
+        Stage('download', downloader.download_one, workers=download_workers),
+        Stage('meta', collect_meta, workers=meta_workers),
+        Stage('analysis', analyse_and_cleanup, workers=analysis_workers),
+    ], max_in_flight=max_in_flight)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+import argparse
+import importlib
+import os
+import threading
+import traceback
+from concurrent.futures.process import BrokenProcessPool
+
+from time import time
+import tracing
+from directory_index import DirectoryIndex
+from pipeline import Pipeline, Stage
+from utils import load_config, iter_all_filenames, get_paths_root, make_folder
+from video import Video
+from worker_pool import DEFAULT_PRELOAD, get_pool, shutdown_pools
+
+STAGES = ('meta', 'process', 'postprocess')
+STAGE_STATUSES = {'meta': Video.METACOLLECTED, 'process': Video.PROCESSED, 'postprocess': Video.POSTPROCESSED}
+
+
+def import_func(path):
+    """ `package.module:func` or `package.module.func` -> func """
+    module, _, name = path.partition(':') if ':' in path else path.rpartition('.')
+    return getattr(importlib.import_module(module), name)
+
+
+def run_stage(stage, path, video_kwargs, func_path=None, func_kwargs=None, retry_errored=False, rebuild=False):
+    """ Run one stage for one video in a worker process, return the new status of the video and whether the stage
+    was actually run (False if it had been done before). With rebuild cached meta is ignored (file was modified) """
+    try:
+        video = Video(path, cached=not rebuild, **video_kwargs)
+    except Exception:
+        print(f'ERROR in runner stage `{stage}`: can not open video `{path}`: {traceback.format_exc()}')
+        return Video.ERRORED, True
+
+    if video.status == Video.ERRORED and retry_errored:
+        video.status = video.meta.get('error', {}).get('status', Video.INITIATED)
+    target = STAGE_STATUSES[stage]
+    if video.cached and video.status >= target:
+        return video.status, False
+
+    status = video.status
+    try:
+        if not video.cached:
+            # meta is collected before any stage, e.g. after the cache was removed
+            video.set_status(max(Video.METACOLLECTED, video.status) if video.status != Video.DEFECTIVE
+                             else Video.DEFECTIVE)
+            status = video.status
+        if video.status == Video.DEFECTIVE:
+            return video.status, True
+        if func_path is not None:
+            import_func(func_path)(video, **(func_kwargs or {}))
+        if video.status not in (Video.ERRORED, Video.DEFECTIVE):
+            video.meta.pop('error', None)
+            video.set_status(max(target, video.status))
+    except Exception:
+        print(f'ERROR in runner stage `{stage}` for video `{path}`: {traceback.format_exc()}')
+        video.meta['error'] = {'stage': stage, 'status': status, 'traceback': traceback.format_exc()}
+        # probing the video again would most likely fail the same way
+        video.set_status(Video.ERRORED, save=False)
+        try:
+            video.save_meta(probe=False)
+        except Exception:
+            print(f'ERROR in runner stage `{stage}`: can not save status of video `{path}`: '
+                  f'{traceback.format_exc()}')
+    return video.status, True
+
+
+class JobRunner:
+    """ Config-driven job runner: discover videos -> collect meta -> process -> postprocess.
+
+    Every stage runs in its own process pool; progress of every video is checkpointed through Video.set_status,
+    so a restarted job skips the work that is already done. Example of config:
+
+        input:
+          paths: [/data/videos]
+          extensions: [.mp4, .mov]
+          cache_dir: /data/videos/.cache
+          exclude_path: '@input.cache_dir'
+          incremental: true  # only files added or modified since the previous run, see DirectoryIndex
+        video:
+          min_fps: 10
+          min_duration: 1
+        stages:
+          meta:
+            workers: 8
+          process:
+            func: my_package.models:process_video  # func(video, **kwargs)
+            workers: 4
+            kwargs: {batch_size: 16}
+          postprocess:
+            func: my_package.models:postprocess_video
+            workers: 2
+    """
+
+    def __init__(self, config, retry_errored=False):
+        self.config = config
+        self.retry_errored = retry_errored
+
+        input_cfg = config['input']
+        self.paths = input_cfg['paths']
+        self.extensions = tuple(input_cfg['extensions'])
+        self.cache_dir = input_cfg['cache_dir']
+        self.exclude_path = input_cfg.get('exclude_path')
+        self.discovery_workers = input_cfg.get('workers', 1)
+        self.incremental = input_cfg.get('incremental', False)
+        self.modified = set()
+        self.video_kwargs = {
+            'cache_dir': self.cache_dir,
+            'root_dir': input_cfg.get('root_dir') or get_paths_root(self.paths),
+            **config.get('video', {})
+        }
+        self.stages_cfg = {name: cfg or {} for name, cfg in config.get('stages', {'meta': {}}).items()}
+        unknown = set(self.stages_cfg) - set(STAGES)
+        assert not unknown, f'Unknown stages {unknown} in config, possible stages are {STAGES}'
+        self.counts = {name: {'done': 0, 'skipped': 0, 'errored': 0, 'defective': 0} for name in self.stages_cfg}
+        self.counts_lock = threading.Lock()
+        self.retry_lock = threading.Lock()
+        self.pipeline = None
+
+    def _preload(self, name):
+        func_path = self.stages_cfg[name].get('func')
+        if func_path is None:
+            return DEFAULT_PRELOAD
+        return DEFAULT_PRELOAD + (func_path.partition(':')[0] if ':' in func_path else func_path.rpartition('.')[0],)
+
+    def _pool(self, name):
+        # get_pool replaces a pool broken by a crashed worker
+        return get_pool(self.stages_cfg[name].get('workers', 1), self._preload(name), owner=f'runner.{name}')
+
+    def _run_in_pool(self, name, path, first):
+        cfg = self.stages_cfg[name]
+        args = (run_stage, name, path, self.video_kwargs, cfg.get('func'), cfg.get('kwargs'), self.retry_errored,
+                first and path in self.modified)
+        try:
+            return self._pool(name).submit(*args).result()
+        except BrokenProcessPool:
+            pass
+        # a worker died (segfault, os._exit) and took all tasks of its pool with it. Every video of the broken pool
+        # is run once more, one at a time in its own pool, so the one that crashes it again is surely the culprit
+        with self.retry_lock:
+            try:
+                return get_pool(1, self._preload(name), owner=f'runner.{name}.retry').submit(*args).result()
+            except BrokenProcessPool:
+                print(f'ERROR in runner stage `{name}`: worker process crashed on video `{path}`')
+                return Video.ERRORED, True
+
+    def _make_stage(self, name, first=False):
+        cfg = self.stages_cfg[name]
+        target = STAGE_STATUSES[name]
+        counts = self.counts[name]
+
+        def func(item):
+            path, status = item
+            if status is not None and status >= target and not (status == Video.ERRORED and self.retry_errored):
+                with self.counts_lock:
+                    counts['skipped'] += 1
+                return item
+            status, ran = self._run_in_pool(name, path, first)
+            key = {Video.ERRORED: 'errored', Video.DEFECTIVE: 'defective'}.get(status, 'done') if ran else 'skipped'
+            with self.counts_lock:
+                counts[key] += 1
+            return path, status
+
+        return Stage(name, func, workers=cfg.get('workers', 1))
+
+    def __call__(self):
+        make_folder(self.cache_dir)
+        names = [name for name in STAGES if name in self.stages_cfg]
+        for name in names:
+            # workers are started before the first video comes
+            self._pool(name)
+        self.pipeline = Pipeline([self._make_stage(name, i == 0) for i, name in enumerate(names)])
+        index = None
+        if self.incremental:
+            # index is saved only after the run, so files of an interrupted run are fed again next time
+            index = DirectoryIndex(self.paths, self.extensions, self.cache_dir, self.exclude_path)
+            changes = index.scan(save=False)
+            self.modified = set(changes.modified)
+            # ERRORED videos are found only among all files
+            paths = list(index) if self.retry_errored else changes.added + changes.modified
+            print(f'Index: {len(changes.added)} added, {len(changes.modified)} modified, '
+                  f'{len(changes.deleted)} deleted files')
+        else:
+            paths = iter_all_filenames(self.paths, self.extensions, self.exclude_path, self.discovery_workers)
+        items = ((path, None) for path in paths)
+        start_time = time()
+        results = self.pipeline.run(items)
+        elapsed = time() - start_time
+        if index is not None:
+            index.save()
+        self.report(elapsed)
+        return results
+
+    def report(self, elapsed):
+        stats = self.pipeline.stats
+        print(f'{"stage":<12}{"done":>8}{"skipped":>9}{"errored":>9}{"defect":>8}{"videos/s":>10}{"busy, %":>9}')
+        for name, counts in self.counts.items():
+            throughput = counts['done'] / elapsed if elapsed > 0 else 0
+            utilization = stats[name]['utilization'] * 100
+            print(f'{name:<12}{counts["done"]:>8}{counts["skipped"]:>9}{counts["errored"]:>9}'
+                  f'{counts["defective"]:>8}{throughput:>10.2f}{utilization:>9.1f}')
+        print(f'Total time: {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run multi-stage video job from YAML config')
+    parser.add_argument('config', help='path to YAML config')
+    parser.add_argument('--retry-errored', action='store_true', help='rerun failed stages of ERRORED videos')
+    parser.add_argument('--trace', metavar='DIR', help='collect traces of all processes into DIR')
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable(args.trace)
+    JobRunner(load_config(args.config), retry_errored=args.retry_errored)()
+    if args.trace:
+        # workers dump their traces when they exit, pools live until exit otherwise
+        shutdown_pools()
+        tracing.dump()
+        trace_events = tracing.merge(args.trace)
+        tracing.export_chrome_trace(os.path.join(args.trace, 'trace.json'), trace_events)
+        tracing.print_summary(trace_events)
@@ -5,6 +5,8 @@ import itertools
 from time import time
 import json
 
+import tracing
+
 
 class SceneDetector:
 
@@ -24,6 +26,7 @@ class SceneDetector:
         self.exp_list_crops = []
         self.transition_list = [0, 0, 0, 0]
 
+    @tracing.traced('scenes.prepare_image')
     def prepare_image(self, frame):
         h, w, _ = frame.shape
         crop_h, crop_w = (h // self.downscale, w // self.downscale)
@@ -47,6 +50,7 @@ class SceneDetector:
 
         return crops
 
+    @tracing.traced('scenes.postprocess')
     def postprocess(self, a, shot_length):
         b = []
 
@@ -76,6 +80,7 @@ class SceneDetector:
 
         return (list(itertools.chain.from_iterable(d)))
 
+    @tracing.traced('scenes.threshold')
     def threshold(self, exps, thr, number):
         results = []
         for i in range(len(exps) - 1):
@@ -125,15 +130,17 @@ class SceneDetector:
 
         frames = 0
         while True:
-            ret, frame = self.video.read()
+            with tracing.span('scenes.decode'):
+                ret, frame = self.video.read()
             if ret:
                 print(f'{frames} / {self.frame_num}')
-                self.exp_list.append(np.mean(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))
-                if frames > 3:
-                    self.transition_list.append(self.get_fade(self.exp_list))
-                    self.exp_list.remove(self.exp_list[0])
-                crops = self.prepare_image(frame)
-                self.exp_list_crops.append([np.mean(crop) for crop in crops])
+                with tracing.span('scenes.features'):
+                    self.exp_list.append(np.mean(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))
+                    if frames > 3:
+                        self.transition_list.append(self.get_fade(self.exp_list))
+                        self.exp_list.remove(self.exp_list[0])
+                    crops = self.prepare_image(frame)
+                    self.exp_list_crops.append([np.mean(crop) for crop in crops])
                 frames+=1
             else:
                 break
@@ -0,0 +1,223 @@
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import get_file_sha256
+
+
+class SegmentedDownload:
+    """ Downloads one file with several parallel HTTP Range requests into a preallocated `<path>.part` file.
+
+    Progress of every segment is kept in a `<path>.part.json` journal, so an interrupted download resumes from
+    where it stopped (unless the remote file changed: size, ETag or Last-Modified differ). On completion the size
+    and, if `expected_sha256` is given, the SHA-256 of the file are verified before it is renamed to `path`.
+    Servers without Range support are downloaded in one stream from scratch.
+    `rate_limiter` is waited once per file (before the probe request), segments of the file start together.
+    `retries` apply to the probe and to every segment; a retried segment continues from where it stopped.
+    """
+
+    def __init__(self, url, path, segments=4, min_segment_size=1 << 20, chunk_size=1 << 16, timeout=30,
+                 retries=3, backoff=1.0, expected_size=None, expected_sha256=None, progress=None, rate_limiter=None,
+                 journal_interval=1.0):
+        self.url = url
+        self.path = path
+        self.part_path = path + '.part'
+        self.journal_path = path + '.part.json'
+        self.segments = segments
+        self.min_segment_size = min_segment_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.expected_size = expected_size
+        self.expected_sha256 = expected_sha256
+        self.progress = progress
+        self.rate_limiter = rate_limiter
+        self.journal_interval = journal_interval
+
+        self.size = None
+        self.accept_ranges = False
+        self.validator = None
+        self.journal = None
+        self.sha256 = None
+        self.lock = threading.Lock()
+        self.last_journal_save = 0
+        self.done_at_start = 0
+
+    def _open(self, headers=None):
+        request = urllib.request.Request(self.url, headers=headers or {})
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def probe(self):
+        """ Learn size, Range support and validator (ETag / Last-Modified) of the remote file """
+        for attempt in range(self.retries + 1):
+            try:
+                return self._probe()
+            except OSError:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _probe(self):
+        with self._open({'Range': 'bytes=0-0'}) as response:
+            content_range = response.headers.get('Content-Range', '')
+            match = re.match(r'bytes \d+-\d+/(\d+)', content_range)
+            if response.status == 206 and match:
+                self.accept_ranges = True
+                self.size = int(match.group(1))
+            else:
+                length = response.headers.get('Content-Length')
+                self.size = int(length) if length is not None else None
+            self.validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+        if self.expected_size is not None and self.size is not None and self.size != self.expected_size:
+            raise RuntimeError(f'Remote size {self.size} of {self.url} differs from expected {self.expected_size}')
+
+    def _new_journal(self):
+        if not self.accept_ranges or not self.size:
+            return {'url': self.url, 'size': self.size, 'validator': self.validator, 'segments': [[0, None, 0]]}
+        n = max(1, min(self.segments, -(-self.size // self.min_segment_size)))
+        bounds = [self.size * i // n for i in range(n + 1)]
+        return {'url': self.url, 'size': self.size, 'validator': self.validator,
+                'segments': [[bounds[i], bounds[i + 1] - 1, 0] for i in range(n)]}
+
+    def load_journal(self):
+        if not (os.path.exists(self.journal_path) and os.path.exists(self.part_path) and self.accept_ranges):
+            return None
+        try:
+            with open(self.journal_path, 'r') as file:
+                journal = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if journal.get('size') != self.size or journal.get('validator') != self.validator:
+            print(f'Remote file {self.url} changed since `{self.part_path}` was started. Downloading from scratch')
+            return None
+        return journal
+
+    def save_journal(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_journal_save < self.journal_interval:
+            return
+        with self.lock:
+            self.last_journal_save = now
+            tmp_path = self.journal_path + '.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump(self.journal, file)
+            os.replace(tmp_path, self.journal_path)
+
+    @property
+    def done_bytes(self):
+        return sum(segment[2] for segment in self.journal['segments'])
+
+    def _fetch_segment(self, segment):
+        for attempt in range(self.retries + 1):
+            try:
+                return self._fetch_range(segment)
+            except OSError:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def _fetch_range(self, segment):
+        start, end, done = segment
+        if not self.accept_ranges and done:
+            # no way to continue a plain stream
+            if self.progress is not None:
+                self.progress.update(-done)
+            segment[2] = done = 0
+        position = start + done
+        if end is not None and position > end:
+            return
+
+        headers = {'Range': f'bytes={position}-{end}'} if self.accept_ranges else {}
+        with self._open(headers) as response:
+            if self.accept_ranges and response.status != 206:
+                raise urllib.error.URLError(f'Server ignored Range request for {self.url}')
+            with open(self.part_path, 'r+b') as file:
+                file.seek(position)
+                while end is None or position <= end:
+                    to_read = self.chunk_size if end is None else min(self.chunk_size, end - position + 1)
+                    chunk = response.read(to_read)
+                    if not chunk:
+                        if end is None and (self.size is None or position >= self.size):
+                            break
+                        raise urllib.error.ContentTooShortError(
+                            f'Segment {start}-{end} of {self.url} stopped at byte {position}', None)
+                    file.write(chunk)
+                    # journal may only count bytes that already reached the file
+                    file.flush()
+                    position += len(chunk)
+                    segment[2] += len(chunk)
+                    if self.progress is not None:
+                        self.progress.update(len(chunk))
+                    self.save_journal()
+
+    def _prepare_part_file(self):
+        mode = 'r+b' if os.path.exists(self.part_path) else 'wb'
+        with open(self.part_path, mode) as file:
+            if self.size is not None and self.accept_ranges:
+                file.truncate(self.size)
+
+    def verify(self):
+        size = os.path.getsize(self.part_path)
+        if self.size is not None and size != self.size:
+            raise RuntimeError(f'Downloaded {size} of {self.size} bytes of {self.url}')
+        self.sha256 = get_file_sha256(self.part_path)
+        if self.expected_sha256 is not None and self.sha256 != self.expected_sha256.lower():
+            raise RuntimeError(f'SHA-256 mismatch for {self.url}: got {self.sha256}, '
+                               f'expected {self.expected_sha256}')
+
+    def _uncount_progress(self, total_added, discarded):
+        """ Undo what a failed attempt added to progress, so that the next attempt doesn't count the file twice.
+        Downloaded bytes stay counted if the next attempt resumes from them """
+        done = self.done_bytes - self.done_at_start
+        if discarded:
+            self.progress.update(-done)
+            self.progress.add_total(-total_added)
+        else:
+            self.progress.add_total(-(total_added - done))
+
+    def __call__(self):
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(self.url)
+        self.probe()
+        self.journal = self.load_journal()
+        if self.journal is None:
+            if os.path.exists(self.part_path):
+                os.remove(self.part_path)
+            self.journal = self._new_journal()
+        self._prepare_part_file()
+        self.save_journal(force=True)
+        self.done_at_start = self.done_bytes
+        total_added = (self.size or 0) - self.done_at_start
+        if self.progress is not None:
+            self.progress.add_total(total_added)
+
+        segments = self.journal['segments']
+        try:
+            try:
+                with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+                    for future in [executor.submit(self._fetch_segment, segment) for segment in segments]:
+                        future.result()
+            finally:
+                self.save_journal(force=True)
+        except Exception:
+            if self.progress is not None:
+                self._uncount_progress(total_added, discarded=not self.accept_ranges)
+            raise
+
+        try:
+            self.verify()
+        except RuntimeError:
+            # corrupted beyond what the journal knows about: next attempt starts from scratch
+            os.remove(self.journal_path)
+            if self.progress is not None:
+                self._uncount_progress(total_added, discarded=True)
+            raise
+        os.replace(self.part_path, self.path)
+        os.remove(self.journal_path)
+        return self.path
@@ -0,0 +1,58 @@
+import http.server
+import os
+import re
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """ Serves `server.data` at any path; `server.ranges` toggles Range support, `server.drops` makes that many
+    responses stop after half of the body """
+
+    def do_GET(self):
+        server = self.server
+        data = server.data
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if server.ranges and match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(data) - 1
+            body = data[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', '"v1"')
+        self.end_headers()
+        with server.lock:
+            server.requests += 1
+            drop = server.drops > 0 and len(body) > 1
+            if drop:
+                server.drops -= 1
+            body = body[:len(body) // 2] if drop else body
+            server.bytes_sent += len(body)
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """ Local HTTP server with Range support """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    server.data = os.urandom(300_000)
+    server.ranges, server.drops, server.requests, server.bytes_sent = True, 0, 0, 0
+    server.lock = threading.Lock()
+    server.root_url = f'http://127.0.0.1:{server.server_address[1]}'
+    server.url = f'{server.root_url}/video.mp4'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,34 @@
+import os
+
+from directory_index import DirectoryIndex
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'w').close()
+
+
+def test_rescan_reports_only_changes(tmp_path):
+    root, cache_dir = str(tmp_path / 'lib'), str(tmp_path / 'cache')
+    touch(os.path.join(root, 'a', '1.mp4'))
+    touch(os.path.join(root, '2.mp4'))
+
+    assert DirectoryIndex(root, ('.mp4',), cache_dir).scan().added == [f'{root}/2.mp4', f'{root}/a/1.mp4']
+    assert DirectoryIndex(root, ('.mp4',), cache_dir).scan() == ([], [], [])
+
+    with open(os.path.join(root, 'a', '1.mp4'), 'w') as file:
+        file.write('changed')
+    touch(os.path.join(root, 'a', '3.mp4'))
+    os.remove(os.path.join(root, '2.mp4'))
+    changes = DirectoryIndex(root, ('.mp4',), cache_dir).scan()
+    assert changes == ([f'{root}/a/3.mp4'], [f'{root}/a/1.mp4'], [f'{root}/2.mp4'])
+
+
+def test_changed_extensions_relist_directories(tmp_path):
+    root, cache_dir = str(tmp_path / 'lib'), str(tmp_path / 'cache')
+    touch(os.path.join(root, 'a', '1.mp4'))
+    touch(os.path.join(root, 'a', '2.mov'))
+
+    DirectoryIndex(root, ('.mp4',), cache_dir).scan()
+    changes = DirectoryIndex(root, ('.mp4', '.mov'), cache_dir).scan()
+    assert changes == ([f'{root}/a/2.mov'], [], [])
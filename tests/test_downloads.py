@@ -0,0 +1,122 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from segmented_download import SegmentedDownload
+from youtube_downloader import PlaylistDownloader, Progress, RateLimiter, download_url
+
+def download(server, path, **kwargs):
+    kwargs = {'segments': 4, 'min_segment_size': 1 << 16, 'timeout': 5, 'backoff': 0, **kwargs}
+    return SegmentedDownload(server.url, path, **kwargs)()
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_full_download(server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    assert download(server, path, expected_sha256=hashlib.sha256(server.data).hexdigest()) == path
+    assert read(path) == server.data
+    assert not os.path.exists(path + '.part') and not os.path.exists(path + '.part.json')
+
+
+def test_resume_from_journal(server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    progress = Progress(stream=None)
+    server.drops = 2
+    with pytest.raises(OSError):
+        download(server, path, retries=0, progress=progress)
+    assert os.path.exists(path + '.part.json') and not os.path.exists(path)
+
+    sent = server.bytes_sent
+    download(server, path, retries=0, progress=progress)
+    assert read(path) == server.data
+    # only the missing parts of the interrupted segments are downloaded again
+    assert server.bytes_sent - sent < len(server.data) // 2
+    assert progress.bytes_total == progress.bytes_done == len(server.data)
+
+
+def test_retries_continue_segments(server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    progress = Progress(stream=None)
+    server.drops = 3
+    download(server, path, retries=3, progress=progress)
+    assert read(path) == server.data
+    assert progress.bytes_total == progress.bytes_done == len(server.data)
+
+
+def test_server_without_ranges(server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    progress = Progress(stream=None)
+    # the probe takes the first drop
+    server.ranges, server.drops = False, 2
+    with pytest.raises(OSError):
+        download(server, path, retries=0, progress=progress)
+    assert progress.bytes_total == progress.bytes_done == 0
+
+    download(server, path, retries=0, progress=progress)
+    assert read(path) == server.data
+    assert progress.bytes_total == progress.bytes_done == len(server.data)
+
+
+def test_sha256_mismatch(server, tmp_path):
+    path = str(tmp_path / 'video.mp4')
+    progress = Progress(stream=None)
+    with pytest.raises(RuntimeError, match='SHA-256 mismatch'):
+        download(server, path, expected_sha256='0' * 64, progress=progress)
+    assert not os.path.exists(path) and not os.path.exists(path + '.part.json')
+    assert progress.bytes_total == progress.bytes_done == 0
+
+
+def test_rate_limit_once_per_file(server, tmp_path):
+    start = time.perf_counter()
+    download_url(server.url, str(tmp_path / 'video.mp4'), rate_limiter=RateLimiter(1.0), segments=4,
+                 min_segment_size=1 << 16)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_playlist_downloader_retries(server, tmp_path):
+    server.drops = 100
+    downloader = PlaylistDownloader(str(tmp_path), retries=0, backoff=0, min_interval=0, progress=False,
+                                    resolver=lambda item: (server.url, item))
+    assert downloader(['video.mp4']) == [None]
+    # probe + one request per segment, no retries of the whole file
+    assert server.requests == 2
+    # what was downloaded stays counted: the next run resumes from it
+    assert downloader.progress.bytes_total == downloader.progress.bytes_done == len(server.data) // 2
+
+    server.drops = 0
+    assert downloader(['video.mp4']) == [str(tmp_path / 'video.mp4')]
+    assert read(str(tmp_path / 'video.mp4')) == server.data
+
+
+def test_resolver_errors_are_not_retried(tmp_path):
+    calls = []
+
+    def resolver(item):
+        calls.append(item)
+        raise RuntimeError(f'No progressive mp4 stream for {item}')
+
+    downloader = PlaylistDownloader(str(tmp_path), retries=3, backoff=10, min_interval=0, progress=False,
+                                    resolver=resolver)
+    assert downloader(['video']) == [None]
+    assert calls == ['video']
+
+
+def test_resolver_network_errors_are_retried(server, tmp_path):
+    calls = []
+
+    def resolver(item):
+        calls.append(item)
+        if len(calls) < 3:
+            raise ConnectionResetError('connection reset')
+        return server.url, item
+
+    downloader = PlaylistDownloader(str(tmp_path), retries=3, backoff=0, min_interval=0, progress=False,
+                                    resolver=resolver)
+    assert downloader(['video.mp4']) == [str(tmp_path / 'video.mp4')]
+    assert len(calls) == 3
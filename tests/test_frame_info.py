@@ -0,0 +1,38 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from frame_info import TextOverlay, add_text_to_frame
+
+SIZES = [(240, 320), (1080, 1920), (1440, 2560), (2160, 3840)]
+
+
+def joined(text):
+    if isinstance(text, tuple):
+        return text[0] + text[1]
+    if isinstance(text, list):
+        return [joined(t) for t in text]
+    return text
+
+
+@pytest.mark.parametrize('h, w', SIZES)
+@pytest.mark.parametrize('text', ['{|}', 'Hello [World] (x) gjpqy', ('Frame: ', '123'), ['abc', ('Frame: ', '9')]])
+def test_overlay_matches_add_text_to_frame(h, w, text):
+    frame = np.random.RandomState(0).randint(0, 256, (h, w, 3), dtype=np.uint8)
+    expected = add_text_to_frame(frame.copy(), joined(text))
+    assert np.array_equal(TextOverlay()(frame.copy(), text), expected)
+
+
+def test_overlay_batch_with_dynamic_text():
+    frames = np.zeros((3, 1080, 1920, 3), dtype=np.uint8)
+    counters = ['1', '22', '333']
+    overlay = TextOverlay()
+    overlay(frames, ['video.mp4', ('Frame: ', counters)])
+
+    for frame, counter in zip(frames, counters):
+        expected = add_text_to_frame(np.zeros_like(frame), ['video.mp4', 'Frame: ' + counter])
+        assert np.array_equal(frame, expected)
+    assert overlay.misses == 2 and overlay.hits == 0
+    overlay(frames, ['video.mp4', ('Frame: ', counters)])
+    assert overlay.hits == 2
@@ -0,0 +1,106 @@
+import itertools
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline, Stage, download_pipeline
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, item):
+        with self.lock:
+            self.value += 1
+        return item
+
+
+def wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_max_in_flight_bounds_items_between_input_and_output():
+    entered = Counter()
+    pipeline = Pipeline([Stage('first', entered, workers=2), Stage('second', lambda x: x * 2, workers=2)],
+                        max_in_flight=5)
+    results = pipeline(range(100))
+    assert next(results) in range(0, 200, 2)
+    time.sleep(0.3)
+    # one item left the pipeline, so at most 5 more could enter it while the output isn't consumed
+    assert entered.value == 6
+    assert len(list(results)) == 99 and entered.value == 100
+
+
+def test_failed_items_are_dropped_and_recorded():
+    def check(x):
+        if x % 3 == 0:
+            raise ValueError(f'bad item {x}')
+        return x
+
+    pipeline = Pipeline([Stage('check', check, workers=3), Stage('double', lambda x: x * 2)], verbose=False)
+    assert sorted(pipeline.run(range(10))) == [2, 4, 8, 10, 14, 16]
+    assert sorted(item for _, item, _ in pipeline.errors) == [0, 3, 6, 9]
+    assert all(stage == 'check' and isinstance(ex, ValueError) for stage, _, ex in pipeline.errors)
+    assert pipeline.stats['check']['errors'] == 4 and pipeline.stats['double']['processed'] == 6
+
+
+def test_closing_the_generator_cancels_the_pipeline():
+    threads_before = threading.active_count()
+    entered = Counter()
+    pipeline = Pipeline([Stage('first', entered, workers=2), Stage('slow', lambda x: time.sleep(0.01) or x)],
+                        max_in_flight=4)
+    results = pipeline(itertools.count())
+    assert len([next(results) for _ in range(3)]) == 3
+    results.close()
+
+    assert wait_for(lambda: threading.active_count() == threads_before)
+    value = entered.value
+    time.sleep(0.1)
+    assert entered.value == value <= 3 + 4
+
+
+def test_download_pipeline_records_failed_probes(server, tmp_path):
+    analysed = []
+    pipeline = download_pipeline(str(tmp_path / 'videos'), str(tmp_path / 'cache'), analyse=analysed.append,
+                                 max_in_flight=2, min_interval=0, progress=False,
+                                 resolver=lambda item: (f'{server.root_url}/{item}', item))
+    pipeline.verbose = False
+    # random bytes are downloaded fine, but are not a video
+    assert pipeline.run(['1.mp4', '2.mp4']) == []
+    assert sorted(os.listdir(tmp_path / 'videos')) == ['1.mp4', '2.mp4']
+    assert sorted(stage for stage, _, _ in pipeline.errors) == ['meta', 'meta']
+    assert analysed == []
+
+
+@pytest.mark.skipif(shutil.which('ffprobe') is None, reason='ffprobe is needed to collect meta')
+def test_download_pipeline(server, tmp_path):
+    np = pytest.importorskip('numpy')
+    cv2 = pytest.importorskip('cv2')
+    source = str(tmp_path / 'source.mp4')
+    writer = cv2.VideoWriter(source, cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+    for i in range(20):
+        writer.write(np.full((48, 64, 3), i * 8, dtype=np.uint8))
+    writer.release()
+    with open(source, 'rb') as file:
+        server.data = file.read()
+
+    def analyse(video):
+        assert os.path.exists(video.path)
+        return video
+
+    pipeline = download_pipeline(str(tmp_path / 'videos'), str(tmp_path / 'cache'), analyse=analyse,
+                                 keep_files=False, min_interval=0, progress=False,
+                                 resolver=lambda item: (f'{server.root_url}/{item}', item))
+    videos = pipeline.run(['1.mp4', '2.mp4', '3.mp4'])
+    assert pipeline.errors == []
+    assert sorted(os.path.basename(video.path) for video in videos) == ['1.mp4', '2.mp4', '3.mp4']
+    assert all(video.frame_num == 20 for video in videos)
+    assert os.listdir(tmp_path / 'videos') == []
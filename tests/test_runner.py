@@ -0,0 +1,124 @@
+import os
+import pickle
+
+import pytest
+
+pytest.importorskip('cv2')
+
+from runner import JobRunner, run_stage
+from video import Video
+
+
+def crash_or_mark_defective(video):
+    """ `process` func of the tests: worker dies on crash*.mp4 like on a segfault in cv2 """
+    if os.path.basename(video.path).startswith('crash'):
+        os._exit(1)
+    video.status = Video.DEFECTIVE
+
+
+def test_broken_video_is_checkpointed_as_errored(tmp_path):
+    root, cache_dir = tmp_path / 'lib', tmp_path / 'cache'
+    os.makedirs(root)
+    os.makedirs(cache_dir)
+    (root / 'broken.mp4').write_text('not a video')
+    video_kwargs = {'cache_dir': str(cache_dir), 'root_dir': str(root)}
+
+    assert run_stage('meta', str(root / 'broken.mp4'), video_kwargs) == (Video.ERRORED, True)
+    with open(cache_dir / 'broken.mp4.meta', 'rb') as file:
+        meta, status = pickle.load(file)
+    assert status == Video.ERRORED and meta['error']['stage'] == 'meta'
+    # the next run doesn't touch it
+    assert run_stage('meta', str(root / 'broken.mp4'), video_kwargs) == (Video.ERRORED, False)
+
+
+def test_job_runner_counts_errored(tmp_path):
+    root, cache_dir = tmp_path / 'lib', tmp_path / 'cache'
+    os.makedirs(root)
+    (root / 'broken.mp4').write_text('not a video')
+    config = {'input': {'paths': [str(root)], 'extensions': ['.mp4'], 'cache_dir': str(cache_dir)},
+              'stages': {'meta': {'workers': 1}}}
+
+    runner = JobRunner(config)
+    runner()
+    assert runner.counts['meta'] == {'done': 0, 'skipped': 0, 'errored': 1, 'defective': 0}
+
+    runner = JobRunner(config)
+    runner()
+    assert runner.counts['meta'] == {'done': 0, 'skipped': 1, 'errored': 0, 'defective': 0}
+
+
+def test_incremental_runs_feed_only_changed_files(tmp_path):
+    root, cache_dir = tmp_path / 'lib', tmp_path / 'cache'
+    os.makedirs(root)
+    (root / 'a.mp4').write_text('not a video')
+    (root / 'b.mp4').write_text('not a video')
+    config = {'input': {'paths': [str(root)], 'extensions': ['.mp4'], 'cache_dir': str(cache_dir),
+                        'incremental': True},
+              'stages': {'meta': {'workers': 1}}}
+
+    def run():
+        runner = JobRunner(config)
+        runner()
+        return runner.counts['meta']
+
+    assert run() == {'done': 0, 'skipped': 0, 'errored': 2, 'defective': 0}
+    assert run() == {'done': 0, 'skipped': 0, 'errored': 0, 'defective': 0}
+
+    (root / 'c.mp4').write_text('not a video')
+    (root / 'a.mp4').write_text('modified, still not a video')
+    os.utime(root / 'a.mp4', ns=(0, 0))
+    # the modified file is probed again instead of being skipped as ERRORED
+    assert run() == {'done': 0, 'skipped': 0, 'errored': 2, 'defective': 0}
+
+
+def test_crashed_worker_fails_only_its_video(tmp_path):
+    root, cache_dir = tmp_path / 'lib', tmp_path / 'cache'
+    os.makedirs(root)
+    os.makedirs(cache_dir)
+    names = ['a.mp4', 'b.mp4', 'crash.mp4', 'c.mp4', 'd.mp4']
+    for name in names:
+        (root / name).write_text('')
+        # meta is collected: only the process stage is run
+        with open(cache_dir / f'{name}.meta', 'wb') as file:
+            pickle.dump([{}, Video.METACOLLECTED], file)
+    config = {'input': {'paths': [str(root)], 'extensions': ['.mp4'], 'cache_dir': str(cache_dir),
+                        'root_dir': str(root)},
+              'stages': {'process': {'workers': 2, 'func': 'test_runner:crash_or_mark_defective'}}}
+
+    runner = JobRunner(config)
+    runner()
+    assert runner.pipeline.errors == []
+    assert runner.counts['process'] == {'done': 0, 'skipped': 0, 'errored': 1, 'defective': 4}
+
+
+def test_every_stage_has_its_own_pool(tmp_path):
+    import worker_pool
+
+    config = {'input': {'paths': [str(tmp_path)], 'extensions': ['.mp4'], 'cache_dir': str(tmp_path / 'cache')},
+              'stages': {'meta': {'workers': 2}, 'process': {'workers': 2}}}
+    JobRunner(config)()
+    owners = [key[0] for key in worker_pool._pools]
+    assert 'runner.meta' in owners and 'runner.process' in owners
+
+
+def test_trace_includes_workers_when_started_from_another_dir(tmp_path):
+    import subprocess
+    import sys
+
+    yaml = pytest.importorskip('yaml')
+    import tracing
+
+    root = tmp_path / 'lib'
+    os.makedirs(root)
+    for name in ('a.mp4', 'b.mp4'):
+        (root / name).write_text('not a video')
+    config = {'input': {'paths': [str(root)], 'extensions': ['.mp4'], 'cache_dir': str(tmp_path / 'cache')},
+              'stages': {'meta': {'workers': 2}}}
+    (tmp_path / 'config.yaml').write_text(yaml.safe_dump(config))
+    runner_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'runner.py')
+    subprocess.run([sys.executable, runner_path, 'config.yaml', '--trace', 'trace'], cwd=str(tmp_path),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=120)
+
+    stages, _ = tracing.summary(tracing.merge(str(tmp_path / 'trace')))
+    # video is opened only in worker processes
+    assert stages['video']['video.open_capture']['count'] == 2
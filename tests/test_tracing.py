@@ -0,0 +1,44 @@
+import json
+import os
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def traced_dir(tmp_path):
+    yield str(tmp_path)
+    tracing.disable()
+    tracing.clear()
+    tracing._output_dir = None
+
+
+def test_events_are_bounded_and_summary_counts_all_spans(traced_dir):
+    tracing.enable(max_events_per_name=10)
+    try:
+        for _ in range(1000):
+            with tracing.span('reader.decode'):
+                pass
+        with tracing.span('video.save_meta'):
+            pass
+        assert len([e for e in tracing.events() if e['ph'] == 'X']) == 11
+        stages, _ = tracing.summary()
+        assert stages['reader']['reader.decode']['count'] == 1000
+        assert stages['video']['video.save_meta']['count'] == 1
+    finally:
+        tracing.enable(max_events_per_name=10000)
+
+
+def test_enable_removes_traces_of_previous_runs(traced_dir):
+    stale_path = os.path.join(traced_dir, 'trace-1.json')
+    with open(stale_path, 'w') as file:
+        json.dump([{'name': 'old.span', 'ph': 'X', 'ts': 0, 'dur': 1, 'pid': 1, 'tid': 1}], file)
+
+    tracing.enable(traced_dir)
+    with tracing.span('new.span'):
+        pass
+    tracing.dump()
+    assert not os.path.exists(stale_path)
+    stages, _ = tracing.summary(tracing.merge(traced_dir))
+    assert list(stages) == ['new']
@@ -0,0 +1,66 @@
+import glob
+import os
+import time
+
+from utils import get_all_filenames, iter_all_filenames
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'w').close()
+
+
+def glob_filenames(path, extensions, exclude_path=None):
+    """ get_all_filenames before the scandir walker """
+    files = glob.glob(os.path.join(path, '**/*.*'), recursive=True)
+    return [f for f in files if f.lower().endswith(extensions)
+            and (exclude_path is None or not f.startswith(exclude_path))]
+
+
+def make_library(root):
+    for path in ['a/1.mp4', 'a/2.MOV', 'a/b/3.mp4', 'a/b/notes.txt', 'c/4.mp4', 'c/.hidden.mp4', '.cache/5.mp4',
+                 'd/e/f/6.mov', '7.mp4', 'cache/8.mp4', 'cache/sub/9.mp4']:
+        touch(os.path.join(root, path))
+
+
+def test_parity_with_glob(tmp_path):
+    root = str(tmp_path)
+    make_library(root)
+    exclude_path = os.path.join(root, 'cache')
+    for workers in (1, 4):
+        for exclude in (None, exclude_path):
+            assert sorted(get_all_filenames(root, ('.mp4', '.mov'), exclude, workers=workers)) == \
+                sorted(glob_filenames(root, ('.mp4', '.mov'), exclude))
+
+
+def test_exclude_path_is_not_entered(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    make_library(root)
+    scanned = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scanned.append(path) or scandir(path))
+
+    files = get_all_filenames(root, ('.mp4',), os.path.join(root, 'cache'))
+    assert not any('cache' in f for f in files)
+    assert not any(path.startswith(os.path.join(root, 'cache')) for path in scanned)
+
+
+def test_workers_walk_in_parallel_and_stop_on_close(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    touch(os.path.join(root, 'a', '1.mp4'))
+    for i in range(300):
+        os.makedirs(os.path.join(root, 'b', str(i)))
+    scanned = []
+    scandir = os.scandir
+
+    def slow_scandir(path):
+        scanned.append(path)
+        time.sleep(0.002)
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', slow_scandir)
+    files = iter_all_filenames(root, ('.mp4',), workers=2)
+    assert next(files) == os.path.join(root, 'a', '1.mp4')
+    files.close()
+    # the walk of `b` without matches ends with the next directory
+    assert len(scanned) < 100
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from video_reader import VideoReader
+
+
+def make_video(path, fps=10, frame_num=30, levels=None):
+    levels = [i * 8 for i in range(frame_num)] if levels is None else levels
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (64, 48))
+    assert writer.isOpened()
+    for level in levels[:frame_num]:
+        writer.write(np.full((48, 64, 3), level, dtype=np.uint8))
+    writer.release()
+    # the reader takes only what it needs from Video
+    return SimpleNamespace(path=path, fps=fps, frame_num=frame_num, is_gopro=False, meta={})
+
+
+def test_adaptive_timestamps_are_presentation_times(tmp_path):
+    video = make_video(str(tmp_path / 'video.mp4'))
+    # timecodes in decode order must not be used
+    video.meta['frames_timecodes'] = list(reversed(range(video.frame_num)))
+    reader = VideoReader(video, target_fps=10, adaptive=True, change_threshold=0)
+    frames = list(reader.generator())
+
+    assert [f.index for f in frames] == list(range(video.frame_num))
+    assert np.allclose([f.timestamp for f in frames], np.arange(video.frame_num) / video.fps)
+
+
+def static_then_changing(path):
+    """ 10 fps: 20 frames of the same picture, then 10 frames getting brighter by 16 """
+    return make_video(path, levels=[64] * 20 + [64 + 16 * (i + 1) for i in range(10)])
+
+
+def test_adaptive_drops_near_duplicates(tmp_path):
+    video = static_then_changing(str(tmp_path / 'video.mp4'))
+    reader = VideoReader(video, target_fps=10, adaptive=True, change_threshold=0.02)
+    frames = list(reader.generator())
+
+    assert [f.index for f in frames] == [0] + list(range(20, 30))
+    assert reader.frames_sampled == 30 and reader.frames_emitted == 11
+    assert reader.skip_ratio == pytest.approx(1 - 11 / 30)
+
+
+def test_adaptive_max_interval(tmp_path):
+    video = static_then_changing(str(tmp_path / 'video.mp4'))
+    reader = VideoReader(video, target_fps=10, adaptive=True, change_threshold=0.02, max_interval=0.45)
+    frames = list(reader.generator())
+
+    # static part is still emitted every max_interval seconds
+    assert [f.index for f in frames] == [0, 5, 10, 15] + list(range(20, 30))
+    assert reader.skip_ratio == pytest.approx(1 - 14 / 30)
+
+
+def test_adaptive_samples_at_target_fps(tmp_path):
+    video = static_then_changing(str(tmp_path / 'video.mp4'))
+    reader = VideoReader(video, target_fps=5, adaptive=True, change_threshold=0.02)
+    frames = list(reader.generator())
+
+    assert [f.index for f in frames] == [0] + list(range(20, 30, 2))
+    assert reader.frames_sampled == 15 and reader.skip_ratio == pytest.approx(1 - 6 / 15)
@@ -0,0 +1,82 @@
+import os
+import stat
+import threading
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+import video_writer
+from video_writer import VideoWriter
+
+SIZE = (64, 48)
+
+
+def frames(n):
+    return [np.full((SIZE[1], SIZE[0], 3), i * 8, dtype=np.uint8) for i in range(n)]
+
+
+def read_levels(path):
+    cap = cv2.VideoCapture(path)
+    levels = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        levels.append(frame.mean())
+    cap.release()
+    return levels
+
+
+def test_frames_are_written_in_order_and_flushed_on_close(tmp_path):
+    path = str(tmp_path / 'out.mp4')
+    writer = VideoWriter(path, fps=10, size=SIZE, buffer_maxsize=4)
+    for frame in frames(30):
+        assert writer.write(frame)
+    writer.close()
+
+    assert len(writer) == writer.stats['frames_queued'] == 30
+    levels = read_levels(path)
+    # mp4v is lossy: levels are close, but the order must be exact
+    assert np.all(np.diff(levels) > 0) and np.allclose(levels, np.arange(30) * 8, atol=6)
+
+
+def test_write_without_blocking_reports_full_queue(tmp_path):
+    writer = VideoWriter(str(tmp_path / 'out.mp4'), fps=10, size=SIZE, buffer_maxsize=1)
+    release = threading.Event()
+    encode = writer._encode
+    writer._encode = lambda frame: release.wait() and encode(frame)
+
+    first, second, third = frames(3)
+    # the first frame is taken by the encoding thread, the second one fills the queue
+    assert writer.write(first) and writer.write(second)
+    assert not writer.write(third, block=False)
+    assert not writer.write(third, timeout=0.05)
+    release.set()
+    writer.close()
+    assert len(writer) == 2
+
+
+def test_cv2_error_is_raised(tmp_path):
+    writer = VideoWriter(str(tmp_path / 'out.mp4'), fps=10, size=SIZE, codec='zzzz')
+    writer.write(frames(1)[0])
+    with pytest.raises(RuntimeError, match='VideoWriter failed') as info:
+        writer.close()
+    assert 'can not open' in str(info.value.__cause__)
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='shell script in place of ffmpeg')
+def test_ffmpeg_stderr_is_raised(tmp_path, monkeypatch):
+    fake_ffmpeg = tmp_path / 'ffmpeg'
+    fake_ffmpeg.write_text('#!/bin/sh\necho "Unknown encoder \'nope\'" >&2\nexit 1\n')
+    fake_ffmpeg.chmod(fake_ffmpeg.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(video_writer, 'FFMPEG', str(fake_ffmpeg))
+
+    writer = VideoWriter(str(tmp_path / 'out.mp4'), fps=10, size=(640, 480), backend='ffmpeg', codec='nope')
+    with pytest.raises(RuntimeError) as info:
+        # frames bigger than the pipe buffer: writing fails once ffmpeg has exited
+        for _ in range(20):
+            writer.write(np.zeros((480, 640, 3), dtype=np.uint8), timeout=1)
+        writer.close()
+    assert 'Unknown encoder' in str(info.value.__cause__)
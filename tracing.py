@@ -0,0 +1,288 @@
+""" Opt-in tracing of hot paths: spans, counters, Chrome trace-event export and per-stage summary.
+
+Disabled by default, then span() returns a shared no-op context manager and count() returns immediately.
+Enable with tracing.enable(output_dir) or the VIDEO_UTILS_TRACE=<output_dir> environment variable; the variable
+is inherited by worker processes, every process dumps its events to <output_dir>/trace-<pid>.json at exit and
+merge() joins them into one trace.
+
+Every span is aggregated into per-name count / total / max, but only the first `max_events_per_name` spans of a
+name are kept as timeline events, so per-frame spans of long-lived workers don't grow memory without limit.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+from collections import defaultdict
+from functools import wraps
+
+from time import perf_counter, time
+
+ENV_VAR = 'VIDEO_UTILS_TRACE'
+
+_enabled = False
+_output_dir = None
+_events = []
+_span_stats = {}  # name -> [count, total, max] in seconds
+_max_events_per_name = 10000
+_counters = defaultdict(int)
+_counters_lock = threading.Lock()
+_thread_names = {}
+_exit_hooks_pid = None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start', 'start_wall')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start_wall = time()
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = perf_counter() - self.start
+        tid = threading.get_ident()
+        if tid not in _thread_names:
+            _thread_names[tid] = threading.current_thread().name
+        event = {'name': self.name, 'ph': 'X', 'ts': self.start_wall * 1e6, 'dur': duration * 1e6,
+                 'pid': os.getpid(), 'tid': tid}
+        with _counters_lock:
+            row = _span_stats.get(self.name)
+            if row is None:
+                row = _span_stats[self.name] = [0, 0., 0.]
+            row[0] += 1
+            row[1] += duration
+            row[2] = max(row[2], duration)
+            if row[0] > _max_events_per_name:
+                return False
+        if self.args:
+            event['args'] = self.args
+        _events.append(event)
+        return False
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(output_dir=None, clear_dir=True, max_events_per_name=None):
+    """ Start collecting events. With output_dir events of this and all child processes are dumped there; with
+    clear_dir trace-*.json files of previous runs are removed from it, so that merge() doesn't pick them up """
+    global _enabled, _output_dir, _max_events_per_name
+    _enabled = True
+    if max_events_per_name is not None:
+        _max_events_per_name = max_events_per_name
+    if output_dir is not None:
+        _output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        if clear_dir:
+            for path in glob.glob(os.path.join(output_dir, 'trace-*.json')):
+                os.remove(path)
+        os.environ[ENV_VAR] = output_dir
+        _register_exit_hooks()
+        _register_after_fork()
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    os.environ.pop(ENV_VAR, None)
+
+
+def clear():
+    _events.clear()
+    with _counters_lock:
+        _counters.clear()
+        _span_stats.clear()
+
+
+def span(name, **args):
+    """ Context manager measuring a block of code: `with tracing.span('video.ffprobe', what='rotation'):` """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """ Decorator version of span(); name defaults to module.qualname of the function """
+
+    def decorator(func):
+        span_name = name or f'{func.__module__}.{func.__qualname__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, None):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, value=1):
+    """ Add value to counter, e.g. count('video.subprocess_launches') or count('video.bytes_pickled', n) """
+    if not _enabled:
+        return
+    with _counters_lock:
+        _counters[name] += value
+
+
+def counters():
+    with _counters_lock:
+        return dict(_counters)
+
+
+def span_stats():
+    with _counters_lock:
+        return {name: list(row) for name, row in _span_stats.items()}
+
+
+def events():
+    """ Events of this process in Chrome trace-event format, counters, thread names and aggregated spans included """
+    pid = os.getpid()
+    result = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': f'pid {pid}'}},
+              {'name': 'span_stats', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': span_stats()}]
+    result += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+               for tid, name in list(_thread_names.items())]
+    result += list(_events)
+    now = time() * 1e6
+    result += [{'name': name, 'ph': 'C', 'ts': now, 'pid': pid, 'tid': 0, 'args': {'value': value}}
+               for name, value in counters().items()]
+    return result
+
+
+def dump(path=None):
+    """ Save events of this process; by default to <output_dir>/trace-<pid>.json """
+    if path is None:
+        if _output_dir is None:
+            return None
+        path = os.path.join(_output_dir, f'trace-{os.getpid()}.json')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(events(), file)
+    os.replace(tmp_path, path)
+    return path
+
+
+def merge(paths):
+    """ Join events dumped by several processes; paths is a list of files or a directory with trace-*.json """
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(os.path.join(paths, 'trace-*.json'))) if os.path.isdir(paths) else [paths]
+    result = []
+    for path in paths:
+        with open(path, 'r') as file:
+            result += json.load(file)
+    return result
+
+
+def export_chrome_trace(path, trace_events=None):
+    """ Write events (by default of this process) as JSON loadable by chrome://tracing or Perfetto """
+    trace_events = events() if trace_events is None else trace_events
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, file)
+    return path
+
+
+def summary(trace_events=None):
+    """ {stage: {name: {count, total, mean, max}}} for spans (seconds) and {counter: value} for counters.
+    Stage is the part of span name before the first dot. Aggregated spans are used for processes that have them,
+    timeline events may be truncated there """
+    trace_events = events() if trace_events is None else trace_events
+    spans = defaultdict(lambda: {'count': 0, 'total': 0., 'max': 0.})
+    counter_values = defaultdict(int)
+    last_counters = {}
+    aggregated_pids = set()
+    for event in trace_events:
+        if event['ph'] == 'M' and event['name'] == 'span_stats':
+            aggregated_pids.add(event['pid'])
+            for name, (count, total, max_duration) in event['args'].items():
+                row = spans[name]
+                row['count'] += count
+                row['total'] += total
+                row['max'] = max(row['max'], max_duration)
+    for event in trace_events:
+        if event['ph'] == 'X' and event['pid'] not in aggregated_pids:
+            row = spans[event['name']]
+            duration = event['dur'] / 1e6
+            row['count'] += 1
+            row['total'] += duration
+            row['max'] = max(row['max'], duration)
+        elif event['ph'] == 'C':
+            # counters are cumulative per process: keep the last value of every process
+            last_counters[(event['pid'], event['name'])] = event['args']['value']
+    for (_, name), value in last_counters.items():
+        counter_values[name] += value
+
+    stages = defaultdict(dict)
+    for name, row in spans.items():
+        row['mean'] = row['total'] / row['count']
+        stages[name.split('.')[0]][name] = row
+    return dict(stages), dict(counter_values)
+
+
+def print_summary(trace_events=None):
+    stages, counter_values = summary(trace_events)
+    print(f'{"span":<40}{"count":>10}{"total, s":>12}{"mean, ms":>12}{"max, ms":>12}')
+    for stage, rows in sorted(stages.items()):
+        print(stage)
+        for name, row in sorted(rows.items(), key=lambda kv: -kv[1]['total']):
+            print(f'  {name:<38}{row["count"]:>10}{row["total"]:>12.3f}'
+                  f'{row["mean"] * 1e3:>12.3f}{row["max"] * 1e3:>12.3f}')
+    for name, value in sorted(counter_values.items()):
+        print(f'{name:<40}{value:>10}')
+
+
+def _register_exit_hooks():
+    global _exit_hooks_pid
+    if _exit_hooks_pid == os.getpid():
+        return
+    _exit_hooks_pid = os.getpid()
+    from multiprocessing import util as mp_util
+
+    atexit.register(dump)
+    # multiprocessing children leave through os._exit and skip atexit, but run these finalizers
+    mp_util.Finalize(None, dump, exitpriority=100)
+
+
+def _after_fork_in_child(_=None):
+    global _exit_hooks_pid
+    # forked workers must not dump events of the parent as their own
+    _events.clear()
+    _counters.clear()
+    _span_stats.clear()
+    _thread_names.clear()
+    # hooks registered under this pid before the fork (e.g. tracing imported first by the child's own start-up) are
+    # already gone: multiprocessing clears finalizers of a child after the fork
+    _exit_hooks_pid = None
+    if _enabled and _output_dir is not None:
+        _register_exit_hooks()
+
+
+def _register_after_fork():
+    # multiprocessing is imported only when tracing is on: it is not cheap for short-lived workers
+    from multiprocessing import util as mp_util
+
+    # multiprocessing clears finalizers of a forked child right after the fork and only then runs its after-fork hooks
+    mp_util.register_after_fork(_NULL_SPAN, _after_fork_in_child)
+
+
+if os.environ.get(ENV_VAR):
+    # a worker of a traced run: files of other processes of this run are already there
+    enable(os.environ[ENV_VAR], clear_dir=False)
@@ -1,14 +1,12 @@
 import codecs
-import glob
 import hashlib
 import os
 import platform
 import subprocess
 import sys
+import threading
 from copy import deepcopy
-import numpy as np
-
-import yaml
+from queue import Queue, Full
 
 WINDOWS = platform.system() not in {'Darwin', 'linux'}
 MAC = platform.system() == 'Darwin'
@@ -32,27 +30,142 @@ def make_folder(folder, hidden=False):
             subprocess.call(["chflags", "hidden", folder])
 
 
-def get_all_filenames(paths: [list, str, tuple], extensions: tuple, exclude_path: str = None) -> list:
-    filenames = []
+def _normalize_extensions(extensions):
+    extensions = (extensions,) if isinstance(extensions, str) else extensions
+    return {ext.lower() if ext.startswith('.') else f'.{ext.lower()}' for ext in extensions}
+
+
+def _match_extension(name, extensions):
+    return os.path.splitext(name)[1].lower() in extensions
+
+
+def _walk_dir(dirpath, extensions, exclude_path, sep, stop=None):
+    """Depth-first `os.scandir` walk yielding matching files. Directories under `exclude_path` are never entered.
+    The walk ends before the next directory once `stop` (threading.Event) is set"""
+    stack = [dirpath]
+    while stack:
+        if stop is not None and stop.is_set():
+            return
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.'):
+                # glob('**/*.*') never matched hidden entries either
+                continue
+            path = f'{current}{sep}{name}'
+            if exclude_path is not None and path.startswith(exclude_path):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                subdirs.append(path)
+            elif _match_extension(name, extensions):
+                yield path
+        stack.extend(reversed(subdirs))
+
+
+def _walk_dirs_parallel(dirpaths, extensions, exclude_path, sep, workers, queue_maxsize=10000):
+    """Walk every dir of `dirpaths` in its own thread and yield files as soon as any thread finds them"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    done = object()
+    stop = threading.Event()
+    files = Queue(maxsize=queue_maxsize)
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                files.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def walk(dirpath):
+        try:
+            for path in _walk_dir(dirpath, extensions, exclude_path, sep, stop):
+                if not put(path):
+                    return
+        finally:
+            put(done)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(walk, dirpath) for dirpath in dirpaths]
+        try:
+            remaining = len(futures)
+            while remaining:
+                item = files.get()
+                if item is done:
+                    remaining -= 1
+                else:
+                    yield item
+        finally:
+            stop.set()
+    for future in futures:
+        future.result()
+
 
+def iter_all_filenames(paths: [list, str, tuple], extensions: tuple, exclude_path: str = None, workers: int = 1):
+    """Generator version of `get_all_filenames`: files are yielded while the tree is still being walked.
+    With workers > 1 top-level directories of every path are walked in parallel threads (order is not kept)"""
     if isinstance(paths, str):
         if os.path.isfile(paths):
-            filenames.append(correct_path(paths))
-            return filenames
-        else:
-            paths = [paths]
+            yield correct_path(paths)
+            return
+        paths = [paths]
 
-    for path in paths:
-        files = glob.glob(os.path.join(path, '**/*.*'), recursive=True) if os.path.isdir(path) else [path]
-        for file in files:
-            if file.lower().endswith(extensions):
-                if exclude_path is not None:
-                    if not correct_path(file).startswith(correct_path(exclude_path)):
-                        filenames.append(correct_path(file))
-                else:
-                    filenames.append(correct_path(file))
+    extensions = _normalize_extensions(extensions)
+    exclude_path = correct_path(exclude_path) if exclude_path is not None else None
+    sep = '/' if WINDOWS else os.sep
 
-    return filenames
+    for path in paths:
+        path = correct_path(path)
+        if not os.path.isdir(path):
+            if _match_extension(path, extensions) and (exclude_path is None or not path.startswith(exclude_path)):
+                yield path
+            continue
+        path = path.rstrip('/' + os.sep) or path
+        if exclude_path is not None and path.startswith(exclude_path):
+            continue
+        if workers <= 1:
+            yield from _walk_dir(path, extensions, exclude_path, sep)
+            continue
+
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            # same as the sequential walk: unreadable directories are skipped
+            continue
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            entry_path = f'{path}{sep}{entry.name}'
+            if exclude_path is not None and entry_path.startswith(exclude_path):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                subdirs.append(entry_path)
+            elif _match_extension(entry.name, extensions):
+                yield entry_path
+        yield from _walk_dirs_parallel(subdirs, extensions, exclude_path, sep, workers)
+
+
+def get_all_filenames(paths: [list, str, tuple], extensions: tuple, exclude_path: str = None,
+                      workers: int = 1) -> list:
+    return list(iter_all_filenames(paths, extensions, exclude_path, workers))
 
 
 def get_sha256(string):
@@ -61,6 +174,14 @@ def get_sha256(string):
     return m.hexdigest()
 
 
+def get_file_sha256(path, chunk_size=1 << 20):
+    m = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            m.update(chunk)
+    return m.hexdigest()
+
+
 def frame_skip_ratio(input_fps, target_fps):
     return max(1, int(input_fps // target_fps))
 
@@ -106,6 +227,8 @@ class YamlLinker:
 
 def load_config(path, link=True):
     """For YAML configs"""
+    import yaml
+
     with codecs.open(path, 'r', 'utf-8') as file:
         data = yaml.safe_load(file)
     if link:
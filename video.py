@@ -2,14 +2,18 @@ import json
 import os
 import pickle
 import subprocess
-import cv2
-import pydub.utils as mdinfo
 
+import tracing
 from utils import MAC, FFPROBE
 
-if MAC:
-    mdinfo.get_prober_name = lambda: FFPROBE
-mdinfo = mdinfo.mediainfo
+
+def mdinfo(path):
+    # pydub (as well as cv2 below) is imported on first use: workers that only read cached meta never load them
+    import pydub.utils
+
+    if MAC:
+        pydub.utils.get_prober_name = lambda: FFPROBE
+    return pydub.utils.mediainfo(path)
 
 
 class Video:
@@ -47,7 +51,7 @@ class Video:
             self.cached = self.load_meta_and_status()
 
         if not self.cached:
-            self.cap = cv2.VideoCapture(self.path)
+            self.init_cap()
             if self.fps < self.min_fps or self.duration < self.min_duration:
                 self.status = self.DEFECTIVE
 
@@ -63,9 +67,27 @@ class Video:
                 f')')
 
     def init_cap(self):
-        self.cap = cv2.VideoCapture(self.path)
+        import cv2
+
+        with tracing.span('video.open_capture'):
+            self.cap = cv2.VideoCapture(self.path)
+
+    def save_meta(self, probe=True):
+        """ Dump meta and status; with probe=False meta is dumped as is, without probing the video again """
+        if probe:
+            self._probe_meta()
+
+        with tracing.span('video.save_meta'), open(self.store_meta_path, 'wb') as file:
+            pickle.dump([self.meta, self.status], file)
+            tracing.count('video.bytes_pickled', file.tell())
+        if hasattr(self, 'cap'):
+            # We need in self.cap only to collect meta for first time
+            # (if instance of Video isn't from dump otherwise self.cap does not exist in Video)
+            self.cap.release()
+            del self.cap
+        self.status = max(self.METACOLLECTED, self.status)
 
-    def save_meta(self):
+    def _probe_meta(self):
         self.meta.update({
             'fps': self.fps,
             'frame_num': self.frame_num,
@@ -81,15 +103,6 @@ class Video:
         if self.is_variable_fps:
             self.meta.update({'frames_timecodes': self.frames_timecodes})
 
-        with open(self.store_meta_path, 'wb') as file:
-            pickle.dump([self.meta, self.status], file)
-        if hasattr(self, 'cap'):
-            # We need in self.cap only to collect meta for first time
-            # (if instance of Video isn't from dump otherwise self.cap does not exist in Video)
-            self.cap.release()
-            del self.cap
-        self.status = max(self.METACOLLECTED, self.status)
-
     def set_status(self, status, save=True):
         self.status = status
         if save:
@@ -99,15 +112,17 @@ class Video:
         assert os.path.exists(self.store_meta_path), f'Path for meta `{self.store_meta_path}` ' \
             f'of video {self.path} must be exist.'
         try:
-            with open(self.store_meta_path, 'rb') as file:
+            with tracing.span('video.load_meta'), open(self.store_meta_path, 'rb') as file:
                 self.meta, self.status = pickle.load(file)
+                tracing.count('video.bytes_unpickled', file.tell())
                 return True
         except:
             return False
 
     def save_data(self):
-        with open(self.store_data_path, 'wb') as file:
+        with tracing.span('video.save_data'), open(self.store_data_path, 'wb') as file:
             pickle.dump(self._data, file)
+            tracing.count('video.bytes_pickled', file.tell())
         self._data = {}
         self.cached = True
 
@@ -115,8 +130,9 @@ class Video:
         if not os.path.exists(self.store_data_path):
             return
 
-        with open(self.store_data_path, 'rb') as file:
+        with tracing.span('video.load_data'), open(self.store_data_path, 'rb') as file:
             self._data = pickle.load(file)
+            tracing.count('video.bytes_unpickled', file.tell())
         self.cached = False
 
     def update_data(self, key, data, add_type='last', save=True):
@@ -157,18 +173,22 @@ class Video:
     @property
     def mediainfo(self):
         if self.meta.get('mediainfo') is None:
-            self.meta['mediainfo'] = mdinfo(self.path)
+            tracing.count('video.subprocess_launches')
+            with tracing.span('video.ffprobe', what='mediainfo'):
+                self.meta['mediainfo'] = mdinfo(self.path)
         return self.meta['mediainfo']
 
     @property
     def fps(self):
         if self.meta.get('fps') is None:
+            import cv2
             self.meta['fps'] = self.cap.get(cv2.CAP_PROP_FPS)
         return self.meta['fps']
 
     @property
     def frame_num(self):
         if self.meta.get('frame_num') is None:
+            import cv2
             self.meta['frame_num'] = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         return self.meta['frame_num']
 
@@ -180,12 +200,14 @@ class Video:
     @property
     def width(self):
         if self.meta.get('width') is None:
+            import cv2
             self.meta['width'] = self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)
         return self.meta['width']
 
     @property
     def height(self):
         if self.meta.get('height') is None:
+            import cv2
             self.meta['height'] = self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
         return self.meta['height']
 
@@ -215,8 +237,10 @@ class Video:
     def is_variable_fps(self):
         if self.meta.get('is_variable_fps') is None:
             command = f'{FFPROBE} -v quiet -print_format json -show_streams "{self.path}"'
-            proc = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True)
-            (out, err) = proc.communicate()
+            tracing.count('video.subprocess_launches')
+            with tracing.span('video.ffprobe', what='is_variable_fps'):
+                proc = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True)
+                (out, err) = proc.communicate()
             if err:
                 raise RuntimeError
             data = json.loads(out)
@@ -227,8 +251,10 @@ class Video:
     def frames_timecodes(self):
         if self.meta.get('frames_timecodes') is None:
             command = f'{FFPROBE} -v quiet -print_format json -show_entries packet=pts_time,duration_time,stream_index "{self.path}"'
-            proc = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True)
-            (out, err) = proc.communicate()
+            tracing.count('video.subprocess_launches')
+            with tracing.span('video.ffprobe', what='frames_timecodes'):
+                proc = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True)
+                (out, err) = proc.communicate()
             if err:
                 raise RuntimeError
             data = json.loads(out)
@@ -240,8 +266,10 @@ class Video:
     def rotation(self):
         if self.meta.get('rotation') is None:
             command = f'{FFPROBE} -loglevel error -select_streams v:0 -show_entries stream_tags=rotate -of default=nw=1:nk=1 -i "{self.path}"'
-            proc = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True)
-            (out, err) = proc.communicate()
+            tracing.count('video.subprocess_launches')
+            with tracing.span('video.ffprobe', what='rotation'):
+                proc = subprocess.Popen(command, stdout=subprocess.PIPE, shell=True)
+                (out, err) = proc.communicate()
             if err:
                 raise RuntimeError
             if out.decode("utf-8") is not '':
@@ -1,16 +1,27 @@
 import os
 import cv2
+import numpy as np
 import traceback
+from collections import namedtuple
 from threading import Thread
 from queue import Queue
 from math import ceil
 
 from time import sleep, time
+import tracing
 from utils import frame_skip_ratio
 
+SampledFrame = namedtuple('SampledFrame', ['frame', 'index', 'timestamp'])
+
 
 class VideoReader:
-    def __init__(self, video, target_fps=25, start_frame=None, end_frame=None, size=None, buffer_maxsize=200):
+    """ With adaptive=True frames sampled at target_fps are additionally filtered in the reader thread: a frame is
+    emitted only if mean absolute difference of its tiny grayscale thumbnail from the last emitted one is at least
+    `change_threshold` (fraction of 255) or `max_interval` seconds passed since the last emitted frame.
+    generator() then yields SampledFrame(frame, index, timestamp) instead of bare frames """
+
+    def __init__(self, video, target_fps=25, start_frame=None, end_frame=None, size=None, buffer_maxsize=200,
+                 adaptive=False, change_threshold=0.02, max_interval=None, thumb_size=(32, 18)):
         self.video = video
         self.start_frame = start_frame or 0
         self.end_frame = end_frame or self.video.frame_num
@@ -18,12 +29,24 @@ class VideoReader:
         self.target_fps = target_fps
         self.skip_rate = frame_skip_ratio(self.video.fps, self.target_fps)
 
+        self.adaptive = adaptive
+        self.change_threshold = change_threshold * 255
+        self.max_interval = max_interval
+        self.thumb_size = tuple(thumb_size)
+        self.frames_sampled = 0
+        self.frames_emitted = 0
+        self._last_thumb = None
+        self._last_timestamp = None
+
         self.cap = cv2.VideoCapture(self.video.path)
         self._init_thread(buffer_maxsize)
         self.frame_counter = 0
 
     def generator(self, stats=None):
-        """ Return BGR frame """
+        """ Return BGR frame (SampledFrame in adaptive mode) """
+        if self.adaptive:
+            yield from self._adaptive_generator()
+            return
         while self.frame_counter < self.video.frame_num:
             if stats is not None:
                 _start_time = time()
@@ -35,6 +58,41 @@ class VideoReader:
             else:
                 self.frame_counter += 1
 
+    def _adaptive_generator(self):
+        while True:
+            sampled_frame = self.next_thread()
+            if sampled_frame is None:
+                return
+            self.frame_counter += 1
+            yield sampled_frame
+
+    @property
+    def skip_ratio(self):
+        """ Part of frames sampled at target_fps that adaptive mode dropped as near-duplicates """
+        return 1 - self.frames_emitted / self.frames_sampled if self.frames_sampled else 0.
+
+    def timestamp(self, frame_id):
+        """ Presentation time in seconds of the frame just read by self.cap. frames_timecodes of the video can't be
+        used here: they are in decode order, which differs from presentation order for streams with B-frames """
+        msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if msec > 0 or frame_id == 0:
+            return msec / 1000
+        # backend doesn't know the position
+        return frame_id / self.video.fps if self.video.fps > 0 else 0.
+
+    def _is_changed(self, frame, timestamp):
+        with tracing.span('reader.change_score'):
+            thumb = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.thumb_size,
+                               interpolation=cv2.INTER_AREA).astype(np.int16)
+        if self._last_thumb is not None:
+            changed = np.abs(thumb - self._last_thumb).mean() >= self.change_threshold
+            expired = self.max_interval is not None and timestamp - self._last_timestamp >= self.max_interval
+            if not (changed or expired):
+                return False
+        self._last_thumb = thumb
+        self._last_timestamp = timestamp
+        return True
+
     def __len__(self):
         return ceil(self.video.frame_num / self.skip_rate)
 
@@ -53,7 +111,8 @@ class VideoReader:
                 if self.frame_queue.full():
                     sleep(time_lag)
                 else:
-                    ret, frame = self.cap.read()
+                    with tracing.span('reader.decode'):
+                        ret, frame = self.cap.read()
                     if frame is None:
                         if self.video.is_gopro:
                             # to solve problem with None frames of GoPro video
@@ -62,8 +121,24 @@ class VideoReader:
                         else:
                             self.done = True
                             return None
+                    tracing.count('reader.frames_decoded')
+                    if self.adaptive:
+                        frame_id += 1
+                        if (frame_id - 1 - self.start_frame) % self.skip_rate != 0:
+                            continue
+                        self.frames_sampled += 1
+                        timestamp = self.timestamp(frame_id - 1)
+                        if not self._is_changed(frame, timestamp):
+                            continue
+                        self.frames_emitted += 1
+                        if self.size is not None:
+                            with tracing.span('reader.resize'):
+                                frame = cv2.resize(frame, self.size)
+                        self.frame_queue.put(SampledFrame(frame, frame_id - 1, timestamp))
+                        continue
                     if self.size is not None:
-                        frame = cv2.resize(frame, self.size)
+                        with tracing.span('reader.resize'):
+                            frame = cv2.resize(frame, self.size)
                     self.frame_queue.put(frame)
                     frame_id += 1
             self.done = True
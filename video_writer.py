@@ -0,0 +1,199 @@
+import subprocess
+import tempfile
+import cv2
+from threading import Thread
+from queue import Queue, Full
+
+from time import time
+from utils import FFMPEG
+
+
+class VideoWriter:
+    """ Counterpart of VideoReader: frames are encoded in a background thread fed by a bounded queue.
+
+    backend='cv2' uses cv2.VideoWriter (`codec` is a fourcc), backend='ffmpeg' pipes raw BGR frames to ffmpeg stdin
+    (`codec`, `preset` and `threads` are passed to ffmpeg as is).
+
+    fps and size are copied from `reader` (VideoReader the frames come from: fps is divided by its skip_rate, size is
+    its resize size) or `video` unless given explicitly; if neither is set, size is taken from the first frame.
+    cv2 rotates decoded frames by the rotation tag of the source itself, so `video.rotation` is written to the output
+    (ffmpeg backend only) just for frames that weren't auto-oriented: auto_oriented=False, or a reader whose
+    capture has CAP_PROP_ORIENTATION_AUTO off.
+    """
+    BACKENDS = ('cv2', 'ffmpeg')
+    _STOP = object()
+
+    def __init__(self, path, video=None, reader=None, fps=None, size=None, rotation=None, auto_oriented=None,
+                 backend='cv2', codec=None, preset='veryfast', threads=0, buffer_maxsize=200):
+        assert backend in self.BACKENDS, f'Wrong backend `{backend}` in VideoWriter'
+        self.path = path
+        video = video or (reader.video if reader is not None else None)
+        self.video = video
+        self.backend = backend
+        self.codec = codec or ('mp4v' if backend == 'cv2' else 'libx264')
+        self.preset = preset
+        self.threads = threads
+
+        if fps is None:
+            fps = video.fps if video is not None else 25
+            if reader is not None:
+                fps /= reader.skip_rate
+        self.fps = fps
+
+        if auto_oriented is None:
+            auto_oriented = True
+            if reader is not None and hasattr(cv2, 'CAP_PROP_ORIENTATION_AUTO'):
+                auto_oriented = bool(reader.cap.get(cv2.CAP_PROP_ORIENTATION_AUTO))
+        if rotation is None:
+            rotation = video.rotation if video is not None and not auto_oriented else 0
+        self.rotation = rotation
+
+        if size is None and reader is not None:
+            size = reader.size
+        if size is None and video is not None:
+            # with auto-orientation cv2 already reports the rotated size
+            size = (int(video.width), int(video.height))
+        self.size = tuple(size) if size is not None else None
+
+        self.writer = None
+        self.proc = None
+        self.released = False
+        self.error = None
+        self.closed = False
+        self.frames_queued = 0
+        self.frames_written = 0
+        self.blocked_time = 0.
+        self.encode_time = 0.
+        self.start_time = time()
+
+        self.frame_queue = Queue(maxsize=buffer_maxsize)
+        self.thread_video_writing = Thread(target=self.write_video, args=(), daemon=True)
+        self.thread_video_writing.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.frames_written
+
+    def _open(self, frame):
+        if self.size is None:
+            h, w = frame.shape[:2]
+            self.size = (w, h)
+        w, h = self.size
+
+        if self.backend == 'cv2':
+            self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.codec), self.fps, self.size)
+            if not self.writer.isOpened():
+                raise RuntimeError(f'cv2.VideoWriter can not open `{self.path}` with codec `{self.codec}`')
+            return
+
+        command = [FFMPEG, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{w}x{h}', '-r', str(self.fps), '-i', '-',
+                   '-c:v', self.codec, '-pix_fmt', 'yuv420p', '-threads', str(self.threads)]
+        if self.preset is not None:
+            command += ['-preset', self.preset]
+        if self.rotation:
+            command += ['-metadata:s:v:0', f'rotate={self.rotation}']
+        command.append(self.path)
+        # stderr goes to a file: a pipe that nobody reads until close could fill up and block ffmpeg
+        self.stderr_file = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self.stderr_file)
+
+    def _encode(self, frame):
+        if frame.shape[1] != self.size[0] or frame.shape[0] != self.size[1]:
+            frame = cv2.resize(frame, self.size)
+        if self.writer is not None:
+            self.writer.write(frame)
+        else:
+            self.proc.stdin.write(frame.tobytes())
+
+    def _release(self):
+        if self.released:
+            return
+        self.released = True
+        if self.writer is not None:
+            self.writer.release()
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = self.proc.wait()
+            self.stderr_file.seek(0)
+            err = self.stderr_file.read()
+            self.stderr_file.close()
+            if returncode != 0:
+                raise RuntimeError(f'ffmpeg failed to write `{self.path}`: {err.decode("utf-8", "ignore")}')
+
+    def write_video(self):
+        try:
+            while True:
+                frame = self.frame_queue.get()
+                if frame is self._STOP:
+                    break
+                start_time = time()
+                if self.writer is None and self.proc is None:
+                    self._open(frame)
+                self._encode(frame)
+                self.encode_time += time() - start_time
+                self.frames_written += 1
+        except Exception as ex:
+            if isinstance(ex, BrokenPipeError):
+                # ffmpeg has exited: the reason is in its stderr, which _release raises
+                try:
+                    self._release()
+                except Exception as release_ex:
+                    ex = release_ex
+            self.error = ex
+            # drain the queue so that a blocked write() can notice the error
+            while self.frame_queue.get() is not self._STOP:
+                pass
+        finally:
+            try:
+                self._release()
+            except Exception as ex:
+                self.error = self.error or ex
+
+    def _check_error(self):
+        if self.error is not None:
+            raise RuntimeError(f'VideoWriter failed for `{self.path}`') from self.error
+
+    def write(self, frame, block=True, timeout=None):
+        """ Queue BGR frame for encoding. Blocks while the queue is full (back-pressure);
+        with block=False or timeout returns False instead of queuing the frame if the queue stays full """
+        assert not self.closed, f'VideoWriter for `{self.path}` is closed'
+        self._check_error()
+        start_time = time()
+        try:
+            self.frame_queue.put(frame, block=block, timeout=timeout)
+        except Full:
+            return False
+        finally:
+            self.blocked_time += time() - start_time
+        self.frames_queued += 1
+        return True
+
+    def close(self):
+        """ Flush all queued frames in order and finalize the file """
+        if not self.closed:
+            self.closed = True
+            self.frame_queue.put(self._STOP)
+            self.thread_video_writing.join()
+        self._check_error()
+
+    @property
+    def stats(self):
+        elapsed = time() - self.start_time
+        return {
+            'frames_queued': self.frames_queued,
+            'frames_written': self.frames_written,
+            'queue_size': self.frame_queue.qsize(),
+            'blocked_time': self.blocked_time,
+            'encode_time': self.encode_time,
+            'fps': self.frames_written / elapsed if elapsed > 0 else 0,
+            'encode_fps': self.frames_written / self.encode_time if self.encode_time > 0 else 0,
+        }
@@ -0,0 +1,74 @@
+import atexit
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_PRELOAD = ('utils', 'video')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _preload(modules):
+    for module in modules:
+        importlib.import_module(module)
+
+
+def get_context(preload=DEFAULT_PRELOAD):
+    """ forkserver context with `preload` modules imported once in the server, every worker is forked from it
+    with those modules already loaded. Falls back to spawn where forkserver is not available (Windows) """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('forkserver')
+        # takes effect only if the forkserver process has not been started yet
+        ctx.set_forkserver_preload(list(preload))
+        _start_forkserver()
+        return ctx
+    return multiprocessing.get_context('spawn')
+
+
+def _start_forkserver():
+    # forkserver of Python < 3.12 ignores sys.path of the parent and swallows ImportError of `preload`: started from
+    # another directory it imported nothing. It is started here with sys.path of the parent in PYTHONPATH
+    from multiprocessing import forkserver
+
+    pythonpath = os.environ.get('PYTHONPATH')
+    os.environ['PYTHONPATH'] = os.pathsep.join([p for p in sys.path if p] + ([pythonpath] if pythonpath else []))
+    try:
+        forkserver.ensure_running()
+    finally:
+        if pythonpath is None:
+            del os.environ['PYTHONPATH']
+        else:
+            os.environ['PYTHONPATH'] = pythonpath
+
+
+def get_pool(workers=None, preload=DEFAULT_PRELOAD, owner=None) -> ProcessPoolExecutor:
+    """ Long-lived process pool shared by bulk APIs: repeated calls with the same arguments return the same pool,
+    so workers are started (and `preload` modules imported) once per process lifetime. Callers that need pools of
+    their own (e.g. one per stage of a job) pass different `owner` """
+    workers = workers or os.cpu_count()
+    key = (owner, workers, tuple(preload))
+    with _pools_lock:
+        pool = _pools.get(key)
+        # a pool with a crashed worker refuses new tasks: replace it
+        if pool is None or pool._broken:
+            if pool is not None:
+                pool.shutdown(wait=False)
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context(preload),
+                                       initializer=_preload, initargs=(tuple(preload),))
+            _pools[key] = pool
+        return pool
+
+
+def shutdown_pools(wait=True):
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait)
+
+
+atexit.register(shutdown_pools)
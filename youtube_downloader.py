@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
-import itertools
+import threading
+import urllib.parse
 import urllib.request
 import urllib.error
 
@@ -7,32 +8,107 @@ import re
 import sys
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-from pytube import YouTube
+from segmented_download import SegmentedDownload
 
 
-class progressBar:
-    def __init__(self, barlength=25):
-        self.barlength = barlength
-        self.position = 0
+class Progress:
+    """ Thread-safe aggregate progress of many downloads, printed as one line """
+
+    def __init__(self, total_files=0, print_interval=0.5, stream=sys.stdout):
+        self.total_files = total_files
+        self.print_interval = print_interval
+        self.stream = stream
+        self.files_done = 0
+        self.files_failed = 0
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.start = time.perf_counter()
+        self.last_print = 0
         self.longest = 0
+        self.lock = threading.Lock()
+
+    def add_total(self, nbytes):
+        with self.lock:
+            self.bytes_total += nbytes
+
+    def update(self, nbytes):
+        with self.lock:
+            self.bytes_done += nbytes
+        self.print_progress()
+
+    def file_done(self, failed=False):
+        with self.lock:
+            if failed:
+                self.files_failed += 1
+            else:
+                self.files_done += 1
+        self.print_progress(force=True)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def print_progress(self, force=False):
+        if self.stream is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self.last_print < self.print_interval:
+            return
+        self.last_print = now
+        elapsed = max(self.elapsed, 1e-6)
+        rate = self.bytes_done / elapsed
+        line = f'\r[{self.files_done}/{self.total_files} files'
+        if self.files_failed:
+            line += f', {self.files_failed} failed'
+        line += f'] {bytestostr(self.bytes_done)} {bytestostr(rate)}/s'
+        if self.bytes_total > self.bytes_done and rate > 0:
+            line += ' ' + getHumanTime((self.bytes_total - self.bytes_done) / rate) + ' left'
+        self.longest = max(self.longest, len(line))
+        self.stream.write(line.ljust(self.longest))
+        self.stream.flush()
+
+    def print_end(self):
+        if self.stream is None:
+            return
+        self.print_progress(force=True)
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+class RateLimiter:
+    """ Spaces out request starts to the same host by at least `min_interval` seconds """
+
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self.next_allowed = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_allowed.get(host, now))
+            self.next_allowed[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def with_retries(func, *args, retries=3, backoff=1.0, exceptions=(OSError,), **kwargs):
+    """ Call func, retrying on `exceptions` with exponential backoff (backoff, 2 * backoff, ...) """
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except exceptions:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
 
-    def print_progress(self, cur, total, start):
-        currentper = cur / total
-        elapsed = int(time.clock() - start) + 1
-        curbar = int(currentper * self.barlength)
-        bar = '\r[' + '='.join(['' for _ in range(curbar)])  # Draws Progress
-        bar += '>'
-        bar += ' '.join(['' for _ in range(int(self.barlength - curbar))]) + '] '  # Pads remaining space
-        bar += bytestostr(cur / elapsed) + '/s '  # Calculates Rate
-        bar += getHumanTime((total - cur) * (elapsed / cur)) + ' left'  # Calculates Remaining time
-        if len(bar) > self.longest:  # Keeps track of space to over write
-            self.longest = len(bar)
-            bar += ' '.join(['' for _ in range(self.longest - len(bar))])
-        sys.stdout.write(bar)
 
-    def print_end(self, *args):  # Clears Progress Bar
-        sys.stdout.write('\r{0}\r'.format((' ' for _ in range(self.longest))))
+def download_url(url, path, progress=None, rate_limiter=None, segments=4, **kwargs):
+    """ Download url to path with parallel resumable Range requests, see SegmentedDownload """
+    return SegmentedDownload(url, path, segments=segments, progress=progress, rate_limiter=rate_limiter, **kwargs)()
 
 
 def getHumanTime(sec):
@@ -113,6 +189,8 @@ def getPlaylistVideoUrls(page_content, url):
 
 # function added to get audio files along with the video files from the playlist
 def download_Video_Audio(path, vid_url, file_no):
+    from pytube import YouTube
+
     try:
         yt = YouTube(vid_url)
     except Exception as e:
@@ -126,12 +204,16 @@ def download_Video_Audio(path, vid_url, file_no):
         video = sorted(yt.filter("mp4"), key=lambda video: int(video.resolution[:-1]), reverse=True)[0]
 
         print("downloading", yt.title + " Video and Audio...")
+    filename = os.path.join(path, video.default_filename)
+    if os.path.exists(filename):
+        # partial downloads live in `.part` files, so an existing file is complete
+        print(yt.title, "already exists in this directory! Skipping video...")
+        return
     try:
-        bar = progressBar()
-        video.download(path)
+        download_url(video.url, filename, expected_size=video.filesize)
         print("successfully downloaded", yt.title, "!")
-    except OSError:
-        print(yt.title, "already exists in this directory! Skipping video...")
+    except Exception as e:
+        print("Error:", str(e), "- Failed to download '" + yt.title + "', it will resume on the next run.")
 
     # try:
     #     os.rename(yt.title + '.mp4', str(file_no) + '.mp4')
@@ -145,6 +227,72 @@ def download_Video_Audio(path, vid_url, file_no):
     #     print(yt.title, "There is some problem with the file names...")
 
 
+def resolve_video(vid_url):
+    """ Return (stream url, file name) of the progressive mp4 stream of a YouTube video """
+    from pytube import YouTube
+
+    yt = YouTube(vid_url)
+    video = yt.streams.filter(progressive=True, file_extension="mp4").order_by('resolution').desc().first()
+    if video is None:
+        raise RuntimeError(f'No progressive mp4 stream for {vid_url}')
+    return video.url, video.default_filename
+
+
+class PlaylistDownloader:
+    """ Downloads many videos with a bounded pool of workers.
+
+    Requests to the same host are spaced out by RateLimiter, failed downloads are retried with exponential
+    backoff. `resolver` maps an item to (url, file name); by default items are YouTube video urls.
+    """
+
+    def __init__(self, directory, workers=4, segments=4, min_interval=1.0, retries=3, backoff=1.0,
+                 resolver=resolve_video, progress=True):
+        self.directory = directory
+        self.workers = workers
+        self.segments = segments
+        self.retries = retries
+        self.backoff = backoff
+        self.resolver = resolver
+        self.rate_limiter = RateLimiter(min_interval)
+        self.show_progress = progress
+        self.progress = None
+
+    def download_one(self, item):
+        # only network errors are worth retrying: a video without a suitable stream won't get one in a few seconds
+        url, filename = with_retries(self._resolve, item, retries=self.retries, backoff=self.backoff)
+        path = os.path.join(self.directory, filename)
+        if os.path.exists(path):
+            print(f'{filename} already exists in this directory! Skipping video...')
+            return path
+        # retries are done by SegmentedDownload per request, so a failed segment doesn't restart the whole file
+        return download_url(url, path, progress=self.progress, rate_limiter=self.rate_limiter, segments=self.segments,
+                            retries=self.retries, backoff=self.backoff)
+
+    def _resolve(self, item):
+        self.rate_limiter.wait(item if isinstance(item, str) and '://' in item else '')
+        return self.resolver(item)
+
+    def _download(self, item):
+        try:
+            path = self.download_one(item)
+        except Exception as e:
+            print(f'\nError: {e} - Skipping `{item}`.')
+            self.progress.file_done(failed=True)
+            return None
+        self.progress.file_done()
+        return path
+
+    def __call__(self, items):
+        """ Return paths in order of items (None for failed downloads) """
+        items = list(items)
+        os.makedirs(self.directory, exist_ok=True)
+        self.progress = Progress(len(items), stream=sys.stdout if self.show_progress else None)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            paths = list(executor.map(self._download, items))
+        self.progress.print_end()
+        return paths
+
+
 def printUrls(vid_urls):
     for url in vid_urls:
         print(url)
@@ -152,19 +300,20 @@ def printUrls(vid_urls):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2 or len(sys.argv) > 4:
-        print('USAGE: python ytPlaylistDL.py playlistURL OR python ytPlaylistDL.py playlistURL destPath')
+    if len(sys.argv) < 2 or len(sys.argv) > 5:
+        print('USAGE: python ytPlaylistDL.py playlistURL [destPath] [videoCount] [workers]')
         exit(1)
     else:
         url = sys.argv[1]
         directory = os.getcwd() if len(sys.argv) < 3 else sys.argv[2]
-        video_count = int(sys.argv[3])
+        video_count = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        workers = int(sys.argv[4]) if len(sys.argv) > 4 else 4
 
         # make directory if dir specified doesn't exist
         try:
             os.makedirs(directory, exist_ok=True)
         except OSError as e:
-            print(e.reason)
+            print(e.strerror)
             exit(1)
 
         if not url.startswith("http"):
@@ -174,9 +323,5 @@ if __name__ == '__main__':
         vid_urls_in_playlist = getPlaylistVideoUrls(playlist_page_content, url)
         print(len(vid_urls_in_playlist))
 
-        # downloads videos and audios
-        for i, vid_url in enumerate(vid_urls_in_playlist):
-            if i >= video_count:
-                break
-            download_Video_Audio(directory, vid_url, i)
-            time.sleep(1)
\ No newline at end of file
+        # downloads videos
+        PlaylistDownloader(directory, workers=workers)(vid_urls_in_playlist[:video_count])